@@ -9,14 +9,15 @@ from dotenv import load_dotenv
 from pathlib import Path
 import copy
 import json
+import functools
 import dash
 import pandas as pd
-from flask import request, jsonify
-from dash.dependencies import Input, Output, ClientsideFunction
+from flask import request, jsonify, Response, stream_with_context
+from dash.dependencies import Input, Output, State, ClientsideFunction
 from dash import dcc
 from dash import html
 import dash_leaflet as leaflet
-import plotly.express as px
+from plotly.io.json import to_json_plotly
 
 from controls import (
     PARAMETERS,
@@ -25,9 +26,16 @@ from controls import (
     UNITS,
     TILE_URL,
     FIGURE_KWARGS,
+    POINT_BUDGET,
+    DOWNSAMPLING,
+    CLIENTSIDE_STORE,
+    REFRESH_INTERVAL,
+    LIVE_TIMINGS,
 )
-from data_handler.handler import DataBaseHandler, ForecastHandler
-from data_handler import windy, rainy
+from data_handler.handler import DataBaseHandler, ForecastHandler, to_epoch
+from data_handler import rainy, sampling, ingest, timelog, metrics, typed, responses
+from data_handler.cache import FigureCache
+from data_handler.spool import IngestQueue
 
 load_dotenv(dotenv_path=Path(__file__).parent.joinpath('.env'))
 
@@ -38,6 +46,9 @@ start_timing = 'day'
 db_handler.start_time = start_timing
 db_handler.end_time = 'now'
 db_handler.app_timing = start_timing
+figure_cache = FigureCache()
+HEADER_PARAMETERS = ('outtemp', 'winsp', 'raind', 'presabs')
+ingest_queue = IngestQueue()
 
 app = dash.Dash(
     __name__,
@@ -48,34 +59,184 @@ server = app.server
 
 
 @server.route('/time_log/', methods=['GET'])
+@metrics.timed_route('route.time_log')
 def get_time_log():
-    """GET database time log."""
+    """GET database time log.
+
+    Query args:
+        recent: only yesterday and today (not streamed).
+        since, until: time window of the log.
+        format: "deltas" (start + seconds between timestamps) or "gaps"
+                (missing ranges given the expected "interval" in seconds).
+    """
     headers = request.headers
     auth = headers.get('apikey')
     if auth == os.getenv('API_ACCESS_KEY'):
+        encoding = request.args.get('format')
+        if encoding not in (None, 'deltas', 'gaps'):
+            return jsonify({"message": "ERROR: Unknown format"}), 400
+        try:
+            chunks = db_handler.iter_time_log(
+                since=request.args.get('since'), until=request.args.get('until')
+            )
+        except ValueError:
+            return jsonify({"message": "ERROR: Could not parse since/until"}), 400
         recent = request.args.get('recent')
-        if recent and recent != 'false':
+        recent = bool(recent and recent != 'false')
+        etag = responses.get_etag(
+            db_handler.data_version.get(),
+            request.query_string.decode(),
+            # "Yesterday and today" moves at midnight, also without new data.
+            db_handler.date_today if recent else '',
+        )
+        if responses.matches(request, etag):
+            return not_modified(etag)
+        if recent:
             log = db_handler.get_recent_time_log()
+            return jsonify({'time_log': log}), 200, {'ETag': etag}
+        if encoding == 'deltas':
+            body = timelog.stream_deltas(chunks)
+        elif encoding == 'gaps':
+            body = timelog.stream_gaps(
+                chunks, request.args.get('interval', 60, type=int)
+            )
         else:
-            log = db_handler.get_time_log()
-        return jsonify({'time_log': log}), 200
+            body = timelog.stream_list(chunks)
+        return Response(
+            stream_with_context(body), mimetype='application/json',
+            headers={'ETag': etag},
+        ), 200
     else:
         return jsonify({"message": "ERROR: Unauthorized"}), 401
 
 
 @server.route('/import/', methods=['PUT'])
+@metrics.timed_route('route.import')
 def import_data():
     """POST data to database."""
     headers = request.headers
     auth = headers.get('apikey')
     if auth == os.getenv('API_ACCESS_KEY'):
-        record = json.loads(request.data)
-        db_handler.post(**record)
-        return jsonify({"message": "OK: data imported"}), 200
+        try:
+            record = json.loads(request.data)
+        except ValueError:
+            return jsonify({"message": "ERROR: Could not parse data"}), 400
+        if not isinstance(record, dict):
+            return jsonify({"message": "ERROR: Expected a JSON object"}), 400
+        if ingest_queue.enabled:
+            ingest_queue.start(db_handler)
+            try:
+                ingest_queue.put([record], db_handler.db_fields)
+            except ValueError as error:
+                return jsonify({"message": f"ERROR: {error}"}), 400
+            return jsonify({"message": "OK: data queued"}), 202
+        try:
+            counts = db_handler.post_many([record])
+        except ValueError as error:
+            return jsonify({"message": f"ERROR: {error}"}), 400
+        return import_response(counts)
     else:
         return jsonify({"message": "ERROR: Unauthorized"}), 401
 
 
+@server.route('/import/batch/', methods=['PUT', 'POST'])
+@metrics.timed_route('route.import_batch')
+def import_batch():
+    """PUT a batch of records (JSON array or NDJSON, optionally gzipped)."""
+    headers = request.headers
+    auth = headers.get('apikey')
+    if auth == os.getenv('API_ACCESS_KEY'):
+        try:
+            records = ingest.parse_records(
+                ingest.decode_body(request.get_data(),
+                                   headers.get('Content-Encoding'))
+            )
+        except (ValueError, OSError):
+            return jsonify({"message": "ERROR: Could not parse data"}), 400
+        if ingest_queue.enabled:
+            ingest_queue.start(db_handler)
+            try:
+                queued = ingest_queue.put(records, db_handler.db_fields)
+            except ValueError as error:
+                return jsonify({"message": f"ERROR: {error}"}), 400
+            return jsonify({"message": "OK: data queued", "queued": queued}), 202
+        try:
+            counts = db_handler.post_many(records)
+        except ValueError as error:
+            return jsonify({"message": f"ERROR: {error}"}), 400
+        return import_response(counts)
+    else:
+        return jsonify({"message": "ERROR: Unauthorized"}), 401
+
+
+def import_response(counts):
+    """Return the response to an import with counts from post_many.
+
+    An import without a single valid row (inserted or duplicate) is an error.
+    """
+    if not counts['inserted'] and not counts['duplicates']:
+        return jsonify({"message": "ERROR: No valid rows", **counts}), 400
+    return jsonify({"message": "OK: data imported", **counts}), 200
+
+
+@server.route('/import/status/', methods=['GET'])
+def get_import_status():
+    """GET depth and write latency of the ingest queue."""
+    headers = request.headers
+    auth = headers.get('apikey')
+    if auth == os.getenv('API_ACCESS_KEY'):
+        if not ingest_queue.enabled:
+            return jsonify({"enabled": False}), 200
+        return jsonify({"enabled": True, **ingest_queue.stats()}), 200
+    else:
+        return jsonify({"message": "ERROR: Unauthorized"}), 401
+
+
+@server.route('/snapshot/', methods=['GET'])
+def get_snapshot():
+    """GET the most recent observation of every parameter."""
+    etag = responses.get_etag(db_handler.data_version.get())
+    if responses.matches(request, etag):
+        return not_modified(etag)
+    return jsonify(db_handler.get_latest_snapshot()), 200, {'ETag': etag}
+
+
+def not_modified(etag):
+    """Return an empty 304 response."""
+    return Response(status=304, headers={'ETag': etag})
+
+
+@server.after_request
+def finish_response(response):
+    """Compress the body."""
+    return responses.compress(response, request.headers.get('Accept-Encoding'))
+
+
+@server.route('/metrics', methods=['GET'])
+def get_metrics():
+    """GET stage timings, row counts and cache/pool gauges (Prometheus).
+
+    Ingest queue gauges are included for requests with the apikey.
+    """
+    gauges = {
+        f'weather_figure_cache_{key}': value
+        for key, value in figure_cache.stats().items()
+    }
+    gauges.update({
+        f'weather_db_pool_{key}': value
+        for key, value in db_handler.get_connection_stats().items()
+    })
+    auth = request.headers.get('apikey')
+    if ingest_queue.enabled and auth == os.getenv('API_ACCESS_KEY'):
+        # Same access as /import/status/.
+        gauges.update({
+            f'weather_ingest_queue_{key}': value
+            for key, value in ingest_queue.stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        })
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
 # Create controls
 parameter_options = [
     {"label": str(PARAMETERS[para]), "value": str(para)} for para in PARAMETERS
@@ -121,17 +282,18 @@ def get_last_timestamp_text():
                 db_handler.get_last_timestamp()
             ).strftime('%Y-%m-%d  %H:%M')
         )
-    except TypeError:
+    except (TypeError, ValueError):
         return "Inga mätvärden ännu."
 
 
 def get_last_parameter_value(parameter):
     """Doc."""
     try:
-        if pd.isnull(db_handler.get_last_parameter_value(parameter)):
+        value = db_handler.get_last_parameter_value(parameter)
+        if pd.isnull(value):
             return '-'
         else:
-            return f'{db_handler.get_last_parameter_value(parameter)} {UNITS.get(parameter)}'
+            return f'{value} {UNITS.get(parameter)}'
     except TypeError:
         return '-'
 
@@ -141,6 +303,8 @@ def serve_layout():
     return html.Div(
         [
             dcc.Store(id="aggregate_data"),
+            dcc.Store(id="live_cursor"),
+            dcc.Interval(id="refresh_interval", interval=REFRESH_INTERVAL * 1000),
             html.Div(id="output-clientside"),
             html.Div(
                 [
@@ -161,7 +325,7 @@ def serve_layout():
                                         style={"marginBottom": "0px",
                                                'textAlign': 'center'},
                                     ),
-                                    html.H6(get_last_timestamp_text()),
+                                    html.H6("", id="text_last_timestamp"),
                                 ]
                             )
                         ],
@@ -229,7 +393,7 @@ def serve_layout():
                                 [
                                     html.Div(
                                         [
-                                            html.H6(get_last_parameter_value('outtemp'),
+                                            html.H6('-',
                                                     id="text_outtemp"),
                                             html.P("Temperatur")
                                         ],
@@ -238,7 +402,7 @@ def serve_layout():
                                     ),
                                     html.Div(
                                         [
-                                            html.H6(get_last_parameter_value('winsp'),
+                                            html.H6('-',
                                                     id="text_winsp"),
                                             html.P("Vindhastighet")
                                         ],
@@ -247,7 +411,7 @@ def serve_layout():
                                     ),
                                     html.Div(
                                         [
-                                            html.H6(get_last_parameter_value('raind'),
+                                            html.H6('-',
                                                     id="text_raind"),
                                             html.P("Regn - 24h")
                                         ],
@@ -256,7 +420,7 @@ def serve_layout():
                                     ),
                                     html.Div(
                                         [
-                                            html.H6(get_last_parameter_value('presabs'),
+                                            html.H6('-',
                                                     id="text_presabs"),
                                             html.P("Lufttryck (abs)")
                                         ],
@@ -286,6 +450,7 @@ def serve_layout():
                             leaflet.Map(children=[
                                 leaflet.TileLayer(url=TILE_URL),  # maxZoom=11,
                                 leaflet.CircleMarker(center=[57.386052, 12.295565],
+                                                     radius=10,
                                                      color='#33ffe6',
                                                      children=[leaflet.Tooltip("Utmaderna")])
                             ], center=[57.354, 12.209], zoom=8,
@@ -313,6 +478,23 @@ def serve_layout():
     )
 
 
+def cached_figure(func):
+    """Cache figures by callback arguments and data version."""
+    @functools.wraps(func)
+    def wrapper(*args):
+        key = json.dumps([func.__name__, *args, db_handler.data_version.get()])
+        value = figure_cache.get(key)
+        if value is not None:
+            return json.loads(value)
+        figure = func(*args)
+        with metrics.timer(f'{func.__name__}.serialize'):
+            value = to_json_plotly(figure).encode()
+        figure_cache.set(key, value)
+        return figure
+    return wrapper
+
+
+@metrics.timed('filter_dataframe')
 def filter_dataframe(parameter, timing):
     """Doc."""
     if parameter != 'presrel':
@@ -321,21 +503,39 @@ def filter_dataframe(parameter, timing):
     else:
         para = 'presabs'
 
+    if parameter in rainy.RAIN_MAPPER:
+        return db_handler.get_rain_totals(parameter, time_period=timing)
+
     df = db_handler.get_parameter_data_for_time_period(
         'timestamp', para, time_period=timing
     )
-    df['timestamp'] = df['timestamp'].apply(pd.Timestamp)
+    return fix_pressure(df, parameter)
 
+
+def fix_pressure(df, parameter):
+    """Return df with presabs as presrel if parameter is presrel."""
     if parameter == 'presrel':
         # Dummy fix. 56 m above sea level = + 7 hpa for the relative pressure.
-        df[para] += 7
-        df.rename(columns={para: parameter}, inplace=True)
-    elif parameter.startswith('rain'):
-        df = rainy.get_rainframe(df, parameter)
-
+        df['presabs'] += 7
+        df.rename(columns={'presabs': parameter}, inplace=True)
     return df
 
 
+def get_cursor():
+    """Return {"epoch": epoch of the latest stored observation}."""
+    timestamp = db_handler.get_last_timestamp()
+    return {'epoch': None if timestamp is None else to_epoch(timestamp)}
+
+
+@metrics.timed('filter_live')
+def filter_live(parameter, since):
+    """Return raw observations of parameter stored after epoch "since"."""
+    para = 'presabs' if parameter == 'presrel' else parameter
+    df = db_handler.get_parameter_data_since('timestamp', 'epoch', para, since=since)
+    return fix_pressure(df, parameter)
+
+
+@metrics.timed('filter_forecast')
 def filter_forecast(parameter, timing):
     """Doc."""
     params = ['timestamp', parameter]
@@ -345,23 +545,16 @@ def filter_forecast(parameter, timing):
     df = fc_handler.get_parameter_data_for_time_period(
         *params, time_period=timing
     )
-    df['timestamp'] = df['timestamp'].apply(pd.Timestamp)
     return df
 
 
+@metrics.timed('filter_wind_rose')
 def filter_wind_rose(timing):
     """Doc."""
-    df = db_handler.get_parameter_data_for_time_period(
-        'winsp', 'windir', time_period=timing
-    )
-    boolean = ~pd.isnull(df['winsp']) & ~pd.isnull(df['windir']) & (df['winsp'] > 0.)
-    df_wind = df.loc[boolean, ['winsp', 'windir']].reset_index(drop=True)
-    df_wind['direction'] = df_wind['windir'].apply(lambda x: windy.get_direction(x))
-    df_wind['strength'] = df_wind['winsp'].apply(lambda x: windy.get_speed_range(x))
-    return windy.get_windframe(df_wind)
+    return db_handler.get_wind_rose('winsp', time_period=timing)
 
 
-app.layout = serve_layout
+app.layout = serve_layout()
 
 # Create callbacks
 app.clientside_callback(
@@ -374,6 +567,21 @@ app.clientside_callback(
 )
 
 
+@app.callback(
+    [
+        Output("text_last_timestamp", "children"),
+        *(Output(f"text_{parameter}", "children") for parameter in HEADER_PARAMETERS),
+    ],
+    Input("refresh_interval", "n_intervals"),
+)
+def update_header(n_intervals):
+    """Fill in the latest observation (on page load and every REFRESH_INTERVAL)."""
+    return [
+        get_last_timestamp_text(),
+        *(get_last_parameter_value(parameter) for parameter in HEADER_PARAMETERS),
+    ]
+
+
 @app.callback(
     Output("loading-output", "children"),
     Input("timing", "value")
@@ -385,18 +593,22 @@ def input_triggers_spinner(timing):
     return None
 
 
-@app.callback(
-    Output("weather_graph", "figure"),
-    [
-        Input("parameters", "value"),
-        Input("timing", "value"),
-    ],
-)
-def make_figure(parameter, timing):
-    """Doc."""
+def build_figure(parameter, timing):
+    """Return figure (dict) of parameter for the timing period."""
     df_selected = filter_dataframe(parameter, timing)
     layout_count = copy.deepcopy(layout)
     y_parameter = df_selected.columns[1]
+    # Raw observations of a live period are extended on refresh, see
+    # extend_figure. A downsampled trace is not (mixed resolutions).
+    live = (timing in LIVE_TIMINGS and parameter not in rainy.RAIN_MAPPER
+            and len(df_selected) <= POINT_BUDGET)
+    with metrics.timer('make_figure.downsample') as frame:
+        df_selected = sampling.downsample(
+            df_selected, y_parameter,
+            method=DOWNSAMPLING.get(parameter, 'lttb'),
+            threshold=POINT_BUDGET,
+        )
+        frame['rows'] = len(df_selected)
     data = [
         dict(
             **FIGURE_KWARGS.get(parameter, {}),
@@ -436,55 +648,170 @@ def make_figure(parameter, timing):
     layout_count['yaxis']["title"] = UNITS.get(y_parameter, '')
     if timing == 'day':
         layout_count['xaxis']['tickformat'] = "%b-%d %H:%M"
+    if live:
+        layout_count['meta'] = {'live_points': len(df_selected)}
 
     figure = dict(data=data, layout=layout_count)
     return figure
 
 
+def encode_figure(figure):
+    """Return figure with typed array data, see typed.encode_figure.
+
+    The observation trace of a live figure is sent as lists, which
+    extendData can append to.
+    """
+    live = 'live_points' in figure['layout'].get('meta', {})
+    return typed.encode_figure(figure, plain=(0,) if live else ())
+
+
+def get_live_points(figure):
+    """Return the number of points of a live figure (None if not live)."""
+    return figure['layout'].get('meta', {}).get('live_points')
+
+
+@metrics.timed('callback.make_figure')
+@cached_figure
+def make_figure(parameter, timing):
+    """Return figure with typed array data (x: epoch ms, y: float32)."""
+    return encode_figure(build_figure(parameter, timing))
+
+
+@metrics.timed('callback.make_store')
+@cached_figure
+def make_store(timing):
+    """Return figures of every parameter for timing, see CLIENTSIDE_STORE.
+
+    Trace data is sent as typed arrays (x: epoch milliseconds, y: float32).
+    """
+    cursor = get_cursor()
+    figures = {}
+    for parameter in PARAMETERS:
+        figures[parameter] = encode_figure(build_figure(parameter, timing))
+    return {'timing': timing, 'figures': figures, 'cursor': cursor}
+
+
+if CLIENTSIDE_STORE:
+    app.callback(
+        Output("aggregate_data", "data"),
+        Input("timing", "value"),
+    )(make_store)
+    app.clientside_callback(
+        ClientsideFunction(namespace="clientside", function_name="figure_from_store"),
+        [
+            Output("weather_graph", "figure"),
+            Output("live_cursor", "data"),
+        ],
+        [
+            Input("parameters", "value"),
+            Input("aggregate_data", "data"),
+        ],
+    )
+else:
+    @app.callback(
+        [
+            Output("weather_graph", "figure"),
+            Output("live_cursor", "data"),
+        ],
+        [
+            Input("parameters", "value"),
+            Input("timing", "value"),
+        ],
+    )
+    def make_figure_and_cursor(parameter, timing):
+        """Doc."""
+        # Cursor first, a row stored while the figure is built is then
+        # appended by extend_figure rather than skipped.
+        cursor = get_cursor()
+        figure = make_figure(parameter, timing)
+        return figure, dict(cursor, points=get_live_points(figure))
+
+
+@app.callback(
+    [
+        Output("weather_graph", "extendData"),
+        Output("live_cursor", "data", allow_duplicate=True),
+    ],
+    Input("refresh_interval", "n_intervals"),
+    [
+        State("parameters", "value"),
+        State("timing", "value"),
+        State("live_cursor", "data"),
+    ],
+    prevent_initial_call=True,
+)
+@metrics.timed('callback.extend_figure')
+def extend_figure(n_intervals, parameter, timing, cursor):
+    """Append observations newer than the cursor to the chart.
+
+    Only for live figures (see build_figure), whose cursor holds the
+    number of points. The trace keeps that many points, so the window
+    moves along with the appended observations.
+    """
+    if (timing not in LIVE_TIMINGS or not cursor or not cursor.get('points')
+            or cursor.get('epoch') is None):
+        return dash.no_update, dash.no_update
+    df = filter_live(parameter, cursor['epoch'])
+    if df.empty:
+        return dash.no_update, dash.no_update
+    trace = typed.to_lists(dict(x=df['timestamp'], y=df[parameter]))
+    update = dict(x=[trace['x']], y=[trace['y']])
+    return (
+        [update, [0], cursor['points']],
+        dict(cursor, epoch=int(df['epoch'].iloc[-1])),
+    )
+
+
 @app.callback(
     Output("wind_rose_graph", "figure"),
     [
         Input("timing", "value"),
     ],
 )
+@metrics.timed('callback.make_wind_rose_figure')
+@cached_figure
 def make_wind_rose_figure(timing):
     """Doc."""
+    # Deferred, plotly.express is only needed here.
+    import plotly.express as px
     df_selected = filter_wind_rose(timing)
 
-    figure = px.bar_polar(
-        r=df_selected["frequency"],
-        theta=df_selected["direction"],
-        color=df_selected["strength"],
-        color_discrete_sequence=px.colors.sequential.Viridis,
-    )
-    figure.update_polars(
-        bgcolor='#1b2444',
-        angularaxis=dict(
-            showline=True,
-            linecolor='#768DB7',
-            gridcolor="#768DB7"
-        ),
-        radialaxis=dict(
-            side="counterclockwise",
-            showline=True,
-            linecolor='#768DB7',
-            gridcolor="#768DB7",
+    with metrics.timer('make_wind_rose_figure.build'):
+        figure = px.bar_polar(
+            r=df_selected["frequency"],
+            theta=df_selected["direction"],
+            color=df_selected["strength"],
+            color_discrete_sequence=px.colors.sequential.Viridis,
+        )
+        figure.update_polars(
+            bgcolor='#1b2444',
+            angularaxis=dict(
+                showline=True,
+                linecolor='#768DB7',
+                gridcolor="#768DB7"
+            ),
+            radialaxis=dict(
+                side="counterclockwise",
+                showline=True,
+                linecolor='#768DB7',
+                gridcolor="#768DB7",
+            )
+        )
+        figure.update_layout(
+            {
+             'margin': {'l': 60, 'r': 30, 'b': 20, 't': 40},
+             'legend': {'font': {'size': 10},
+                        'orientation': 'h',
+                        'title': 'Vindhastighet (m/s)'},
+             'title': 'Vindrosett', 'title_x': .5,
+             'paper_bgcolor': '#1b2444',
+             'plot_bgcolor': '#1b2444',
+             'font': {'family': 'verdana', 'color': '#768DB7'}}
         )
-    )
-    figure.update_layout(
-        {
-         'margin': {'l': 60, 'r': 30, 'b': 20, 't': 40},
-         'legend': {'font': {'size': 10},
-                    'orientation': 'h',
-                    'title': 'Vindhastighet (m/s)'},
-         'title': 'Vindrosett', 'title_x': .5,
-         'paper_bgcolor': '#1b2444',
-         'plot_bgcolor': '#1b2444',
-         'font': {'family': 'verdana', 'color': '#768DB7'}}
-    )
 
     return figure
 
 
 if __name__ == "__main__":
+    db_handler.migrate()
     app.run_server(debug=True)
@@ -7,5 +7,14 @@ window.dash_clientside.clientside = {
       window.dispatchEvent(new Event("resize"));
     }, 500);
     return null;
+  },
+  figure_from_store: function(parameter, store) {
+    if (!store || !store.figures || !store.figures[parameter]) {
+      return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+    }
+    var figure = store.figures[parameter];
+    var meta = (figure.layout && figure.layout.meta) || {};
+    var cursor = Object.assign({}, store.cursor, {points: meta.live_points || null});
+    return [figure, cursor];
   }
 };
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Long-range reads of the wind direction (raw only, no rollup) from SQLite
+only and from the monthly archive plus the SQLite tail.
+
+    python -m benchmarks.bench_archive [days ...]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from data_handler import archive
+from data_handler.handler import DataBaseHandler
+from tests.synthetic import make_weather_db
+from benchmarks.bench_time_index import best_of
+
+PERIODS = ('month', 'halfyear', 'fullyear')
+COLUMNS = ('timestamp', 'windir')
+
+
+def run(days):
+    """Print one line per period for a database of "days" length."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp).joinpath('weather.db'))
+        make_weather_db(path, days)
+        os.environ['TSTWEATHERDB'] = path
+        os.environ.pop(archive.ENV_KEY, None)
+        handler = DataBaseHandler()
+        handler.migrate()
+        conn = handler.get_conn()
+        nr_rows = conn.execute('select count(*) from weather').fetchone()[0]
+        before = {
+            p: best_of(lambda: handler.get_parameter_data_for_time_period(
+                *COLUMNS, time_period=p))
+            for p in PERIODS
+        }
+        archive.compact(conn, Path(tmp).joinpath('archive'))
+        os.environ[archive.ENV_KEY] = str(Path(tmp).joinpath('archive'))
+        handler = DataBaseHandler()
+        for period in PERIODS:
+            after = best_of(lambda: handler.get_parameter_data_for_time_period(
+                *COLUMNS, time_period=period))
+            print(f'{nr_rows:>10} {period:>10} {before[period]:>12.2f} {after:>12.2f}')
+
+
+if __name__ == '__main__':
+    print(f'{"rows":>10} {"period":>10} {"sqlite (ms)":>12} {"archive (ms)":>12}')
+    for days in [int(d) for d in sys.argv[1:]] or (365,):
+        run(days)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Figure payload size and build time for a year of 1-minute data, with and
+without downsampling.
+
+    python -m benchmarks.bench_downsampling
+"""
+import time
+import plotly.io as pio
+
+from controls import DOWNSAMPLING, POINT_BUDGET
+from data_handler import sampling
+from tests.synthetic import get_weather_frame
+
+
+def build(df, parameter, downsample):
+    """Return serialized figure and elapsed time (ms)."""
+    start = time.perf_counter()
+    if downsample:
+        df = sampling.downsample(
+            df, parameter, method=DOWNSAMPLING.get(parameter, 'lttb'),
+            threshold=POINT_BUDGET,
+        )
+    payload = pio.to_json(
+        {'data': [{'x': df['timestamp'], 'y': df[parameter], 'type': 'scatter'}]}
+    )
+    return payload, (time.perf_counter() - start) * 1000
+
+
+if __name__ == '__main__':
+    df = get_weather_frame(365)
+    df['timestamp'] = df['timestamp'].astype('datetime64[ns]')
+    print(f'{"parameter":>10} {"raw kB":>10} {"raw ms":>8} {"down kB":>10} {"down ms":>8}')
+    for parameter in ('outtemp', 'gust', 'winsp', 'presabs'):
+        raw, raw_ms = build(df, parameter, False)
+        down, down_ms = build(df, parameter, True)
+        print(f'{parameter:>10} {len(raw) / 1e3:>10.0f} {raw_ms:>8.1f} '
+              f'{len(down) / 1e3:>10.0f} {down_ms:>8.1f}')
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Forecast ingestion on large synthetic PMP3g payloads: a full first run,
+a repeated run (nothing changed) and a newer run where a tenth of the
+rows changed, against rewriting the whole table.
+
+    python -m benchmarks.bench_forecast_ingest [nr_steps ...]
+"""
+import sys
+import time
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from data_handler import forecast
+from tests.synthetic import get_forecast_payload
+
+
+def timeit(func, *args):
+    """Return (result, elapsed ms)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def rewrite(conn, data):
+    """Replace the whole table, as a plain rewrite would."""
+    df = forecast.get_frame(data)
+    conn.execute('DELETE FROM forecast')
+    df.assign(issue_time=data['referenceTime']).to_sql(
+        'forecast', conn, if_exists='append')
+    conn.commit()
+
+
+def run(nr_steps):
+    """Print timings for a payload of nr_steps time steps."""
+    first = get_forecast_payload(nr_steps)
+    second = get_forecast_payload(nr_steps)
+    second['referenceTime'] = '2022-01-30T11:00:00Z'
+    for step in second['timeSeries'][::10]:
+        step['parameters'][0]['values'] = [-30.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp).joinpath('forecast.db'))
+        _, parse = timeit(forecast.get_frame, first)
+        _, full = timeit(forecast.ingest, first, conn)
+        _, again = timeit(forecast.ingest, first, conn)
+        result, delta = timeit(forecast.ingest, second, conn)
+        _, rewritten = timeit(rewrite, conn, second)
+    print(f'{nr_steps:>8} {parse:>10.1f} {full:>10.1f} {again:>10.1f} '
+          f'{delta:>10.1f} {result["changed"]:>8} {rewritten:>10.1f}')
+
+
+if __name__ == '__main__':
+    print(f'{"steps":>8} {"parse ms":>10} {"first ms":>10} {"same ms":>10} '
+          f'{"delta ms":>10} {"changed":>8} {"rewrite ms":>10}')
+    for nr_steps in [int(n) for n in sys.argv[1:]] or (100, 10000, 100000):
+        run(nr_steps)
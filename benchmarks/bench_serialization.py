@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Payload bytes and encode time of the weather figure per timing, as plain
+lists (json and orjson engines) and as typed arrays (orjson engine).
+
+    python -m benchmarks.bench_serialization [days]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+from controls import TIMING_OPTIONS
+from data_handler import typed
+from tests.synthetic import make_weather_db
+from benchmarks.bench_time_index import best_of
+
+PARAMETER = 'outtemp'
+
+
+def encoded(figure, engine, encode=None):
+    """Return (bytes, best encode time in ms) of figure.
+
+    "encode" (eg. typed.encode_figure) is applied within the timing.
+    """
+    encode = encode or (lambda f: f)
+    pio.json.config.default_engine = engine
+    try:
+        text = to_json_plotly(encode(figure))
+        return len(text.encode()), best_of(lambda: to_json_plotly(encode(figure)))
+    finally:
+        pio.json.config.default_engine = 'auto'
+
+
+def run(days):
+    """Print one line per timing for a database of "days" length."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp).joinpath('weather.db'))
+        make_weather_db(path, days)
+        os.environ['TSTWEATHERDB'] = path
+        os.environ['FORECASTDB'] = str(Path(tmp).joinpath('forecast.db'))
+        import app
+        app.db_handler.migrate()
+        for timing in TIMING_OPTIONS:
+            if timing in ('day', 'days3'):
+                # Without forecast traces (no forecast database here).
+                figure = app.build_figure('intemp', timing)
+            else:
+                figure = app.build_figure(PARAMETER, timing)
+            plain_json = encoded(figure, 'json')
+            plain_orjson = encoded(figure, 'orjson')
+            typed_orjson = encoded(figure, 'orjson', typed.encode_figure)
+            print(f'{timing:>10}' + ''.join(
+                f' {size:>10} {ms:>8.2f}'
+                for size, ms in (plain_json, plain_orjson, typed_orjson)
+            ))
+
+
+if __name__ == '__main__':
+    print(f'{"timing":>10}' + ''.join(
+        f' {name + " B":>10} {"ms":>8}'
+        for name in ('json', 'orjson', 'typed')
+    ))
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 365)
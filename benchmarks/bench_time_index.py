@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Latency of time window queries against table size, before and after the
+epoch index migration.
+
+    python -m benchmarks.bench_time_index [days ...]
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+import pandas as pd
+
+from controls import TIMING_OPTIONS
+from data_handler.handler import get_db_conn, get_start_time, to_epoch
+from data_handler.schema import migrate
+from tests.synthetic import make_weather_db
+
+REPEAT = 5
+
+
+def best_of(func, repeat=REPEAT):
+    """Return the best wall time (ms) of repeat calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def text_query(conn, period):
+    """Query the way handler.py did before the migration."""
+    start_time = get_start_time(period)
+    end_time = pd.Timestamp.today(tz='Europe/Stockholm').strftime('%Y-%m-%d %H:%M:%S')
+    return conn.execute(
+        'select timestamp, outtemp from weather where timestamp between ? and ?',
+        (start_time, end_time)
+    ).fetchall()
+
+
+def epoch_query(conn, period):
+    """Query the epoch index range."""
+    start_time = get_start_time(period)
+    return conn.execute(
+        'select timestamp, outtemp from weather where epoch between ? and ?',
+        (to_epoch(start_time), to_epoch(pd.Timestamp.today(tz='Europe/Stockholm')))
+    ).fetchall()
+
+
+def run(days):
+    """Print one line per period for a database of "days" length."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp).joinpath('weather.db'))
+        make_weather_db(path, days, index=False)
+        os.environ['TSTWEATHERDB'] = path
+        conn = get_db_conn()
+        nr_rows = conn.execute('select count(*) from weather').fetchone()[0]
+        before = {p: best_of(lambda: text_query(conn, p)) for p in TIMING_OPTIONS}
+        migrate(conn)
+        for period in TIMING_OPTIONS:
+            after = best_of(lambda: epoch_query(conn, period))
+            print(f'{nr_rows:>10} {period:>10} {before[period]:>12.2f} {after:>12.2f}')
+
+
+if __name__ == '__main__':
+    print(f'{"rows":>10} {"period":>10} {"text (ms)":>12} {"epoch (ms)":>12}')
+    for days in [int(d) for d in sys.argv[1:]] or (30, 365, 1095):
+        run(days)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Per-row pd.Timestamp parsing versus vectorised parsing of the testdata
+timestamps (repeated up to 1M rows), including the rain grouping keys.
+
+    python -m benchmarks.bench_timestamps
+"""
+import time
+import pathlib
+import numpy as np
+import pandas as pd
+
+from data_handler import rainy
+from data_handler.handler import TIMESTAMP_FORMAT
+
+DATA_PATH = pathlib.Path(__file__).parent.parent.joinpath('data').resolve()
+
+
+def old_path(df):
+    """Parse with apply(pd.Timestamp) and group on per-row date objects."""
+    df = df.copy()
+    df['timestamp'] = df['timestamp'].apply(pd.Timestamp)
+    return df.groupby(
+        [df['timestamp'].dt.date, df['timestamp'].dt.hour]
+    ).max().reset_index(drop=True)
+
+
+def new_path(df):
+    """Parse with a known format and group on a vectorised period key."""
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT)
+    return rainy.get_rainframe(df, 'rainh')
+
+
+def timeit(func, df):
+    """Return elapsed time (ms)."""
+    start = time.perf_counter()
+    func(df)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == '__main__':
+    df = pd.read_feather(DATA_PATH.joinpath('testdata'))[['timestamp', 'rainh']]
+    print(f'{"rows":>10} {"old (ms)":>10} {"new (ms)":>10} {"speed-up":>10}')
+    for nr_rows in (len(df), 100000, 1000000):
+        sample = df.iloc[np.resize(np.arange(len(df)), nr_rows)].reset_index(drop=True)
+        before = timeit(old_path, sample)
+        after = timeit(new_path, sample)
+        print(f'{nr_rows:>10} {before:>10.1f} {after:>10.1f} {before / after:>10.0f}x')
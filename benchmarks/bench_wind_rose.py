@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Row by row versus vectorised wind rose binning, on the testdata wind
+observations repeated up to 1k, 100k and 1M rows.
+
+    python -m benchmarks.bench_wind_rose
+"""
+import time
+import pathlib
+import numpy as np
+import pandas as pd
+
+from data_handler import windy
+
+DATA_PATH = pathlib.Path(__file__).parent.parent.joinpath('data').resolve()
+
+
+def row_by_row(df):
+    """Binning as done with Series.apply before vectorisation."""
+    df = df.copy()
+    df['direction'] = df['windir'].apply(lambda x: windy.get_direction(x))
+    df['strength'] = df['winsp'].apply(lambda x: windy.get_speed_range(x))
+    combos = df[['direction', 'strength']].apply(tuple, axis=1)
+    data = {c: [] for c in ('direction', 'strength', 'frequency')}
+    nr_obs = float(len(combos))
+    for strength in sorted(df['strength'].unique()):
+        for windir in windy.wind_directions:
+            data['direction'].append(windir)
+            data['strength'].append(strength)
+            data['frequency'].append((combos == (windir, strength)).sum() / nr_obs * 100)
+    return pd.DataFrame(data)
+
+
+def vectorised(df):
+    """Binning with windy.get_wind_rose."""
+    return windy.get_wind_rose(df['winsp'], df['windir'])
+
+
+def timeit(func, df):
+    """Return elapsed time (ms)."""
+    start = time.perf_counter()
+    func(df)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == '__main__':
+    df = pd.read_feather(DATA_PATH.joinpath('testdata'))
+    boolean = ~pd.isnull(df['winsp']) & ~pd.isnull(df['windir']) & (df['winsp'] > 0.)
+    df = df.loc[boolean, ['winsp', 'windir']].reset_index(drop=True)
+    print(f'{"rows":>10} {"apply (ms)":>12} {"numpy (ms)":>12} {"speed-up":>10}')
+    for nr_rows in (1000, 100000, 1000000):
+        sample = df.iloc[np.resize(np.arange(len(df)), nr_rows)].reset_index(drop=True)
+        before = timeit(row_by_row, sample)
+        after = timeit(vectorised, sample)
+        print(f'{nr_rows:>10} {before:>12.1f} {after:>12.2f} {before / after:>10.0f}x')
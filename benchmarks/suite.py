@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+pytest-benchmark suite of the data path and the figure callbacks, for
+every TIMING_OPTIONS period on synthetic databases of 1 day, 1 year and
+5 years of 1-minute data.
+
+    python -m pytest benchmarks/suite.py --benchmark-autosave \
+        --benchmark-storage=benchmarks/results
+
+Results are saved as JSON (one file per run, named after the commit) and
+runs are compared with:
+
+    pytest-benchmark --storage benchmarks/results compare
+
+Set BENCH_DAYS (eg. "1,365") to limit the database sizes.
+"""
+import os
+import inspect
+import pytest
+import pandas as pd
+
+from controls import TIMING_OPTIONS
+from data_handler import rainy, forecast
+from data_handler.handler import get_db_conn, get_forecast_db_conn
+from data_handler.schema import migrate
+from tests.synthetic import make_weather_db, get_forecast_payload
+
+pytest.importorskip('pytest_benchmark')
+
+DAYS = [int(d) for d in os.getenv('BENCH_DAYS', '1,365,1825').split(',')]
+TIMINGS = list(TIMING_OPTIONS)
+
+
+@pytest.fixture(scope='session')
+def dash_app(tmp_path_factory):
+    """Return the app module, with a forecast database in place."""
+    path = tmp_path_factory.mktemp('forecast').joinpath('forecast.db')
+    os.environ['FORECASTDB'] = str(path)
+    reference_time = pd.Timestamp.now(tz='UTC').floor('h').strftime('%Y-%m-%dT%H:%M:%SZ')
+    forecast.ingest(get_forecast_payload(72, reference_time=reference_time),
+                    conn=get_forecast_db_conn())
+    import app
+    return app
+
+
+@pytest.fixture(scope='module', params=DAYS, ids=lambda days: f'{days}d')
+def database(request, tmp_path_factory, dash_app):
+    """Point the app at a synthetic, migrated database of "days" length."""
+    path = tmp_path_factory.mktemp(f'weather{request.param}').joinpath('weather.db')
+    make_weather_db(str(path), request.param)
+    os.environ['TSTWEATHERDB'] = str(path)
+    migrate(get_db_conn())
+    return dash_app
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_get_parameter_data(benchmark, database, timing):
+    benchmark(
+        database.db_handler.get_parameter_data_for_time_period,
+        'timestamp', 'outtemp', time_period=timing,
+    )
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+@pytest.mark.parametrize('parameter', ['outtemp', 'rainh'])
+def test_filter_dataframe(benchmark, database, parameter, timing):
+    benchmark(database.filter_dataframe, parameter, timing)
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_filter_wind_rose(benchmark, database, timing):
+    benchmark(database.filter_wind_rose, timing)
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_get_rainframe(benchmark, database, timing):
+    df = database.db_handler.get_parameter_data_for_time_period(
+        'timestamp', 'rainh', time_period=timing, resolution='raw'
+    )
+    benchmark(rainy.get_rainframe, df, 'rainh')
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_make_figure(benchmark, database, timing):
+    # Uncached, see app.cached_figure.
+    benchmark(inspect.unwrap(database.make_figure), 'outtemp', timing)
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_make_wind_rose_figure(benchmark, database, timing):
+    benchmark(inspect.unwrap(database.make_wind_rose_figure), timing)
+
+
+@pytest.mark.parametrize('timing', TIMINGS)
+def test_make_store(benchmark, database, timing):
+    benchmark(inspect.unwrap(database.make_store), timing)
@@ -60,6 +60,40 @@ FORECAST_PARAMETERS = {
 }
 
 
+# Max number of points per chart, longer series are downsampled.
+POINT_BUDGET = 2000
+
+# Seconds between refreshes of the latest values in the header.
+REFRESH_INTERVAL = 60
+
+# Periods where new observations are appended to the chart on refresh
+# (unless the chart is downsampled).
+LIVE_TIMINGS = ('day', 'days3')
+
+# Load all parameters of a time period into the browser at once and switch
+# parameter without asking the server (clientside callback).
+CLIENTSIDE_STORE = True
+
+# Downsampling method per parameter (see data_handler.sampling).
+DOWNSAMPLING = dict(
+    intemp='mean',
+    outtemp='mean',
+    outhumi='mean',
+    outdew='mean',
+    outfeel='mean',
+    winsp='lttb',
+    gust='minmax',
+    windir='lttb',
+    presabs='mean',
+    presrel='mean',
+    rainh='sum',
+    raind='sum',
+    rainw='sum',
+    rainm='sum',
+    raint='sum',
+)
+
+
 UNITS = dict(
     intemp='°C',
     outtemp='°C',
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Columnar archive of closed months of the weather table.
+
+Each closed month is written to one uncompressed Feather (Arrow IPC) file
+in the directory given by the environment variable WEATHERARCHIVE. Long
+raw reads, those the rollups can not serve (rollup.RAW_ONLY parameters
+such as windir, or an explicit resolution="raw"), take the archived
+months through memory-mapped, column projected reads and only the hot
+tail from SQLite. The SQLite table stays
+the source of truth, table "archive_months" lists the months whose file
+matches it; a late insert into an archived month removes that month from
+the list until the next compaction.
+
+Compact closed months (eg. daily from cron) with:
+    python -m data_handler.archive
+
+pyarrow is imported on first use, the app does not pay for it unless the
+archive is enabled.
+"""
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from . import query, schema
+
+
+ENV_KEY = 'WEATHERARCHIVE'
+
+
+def get_directory(env_key=ENV_KEY):
+    """Return the archive directory, None if the archive is not used."""
+    path = os.getenv(env_key)
+    return Path(path) if path else None
+
+
+def get_path(directory, month):
+    """Return path of the file of month ("YYYY-MM")."""
+    return Path(directory).joinpath(f'weather_{month}.feather')
+
+
+def get_month_bounds(epoch):
+    """Return (month, start epoch, end epoch) of the month containing epoch."""
+    period = pd.Timestamp(int(epoch), unit='s').to_period('M')
+    start = (period.start_time - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    end = ((period + 1).start_time - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return str(period), int(start), int(end)
+
+
+def create_tables(conn):
+    """Create table "archive_months". Return True if it did not exist before."""
+    exists = schema.table_exists(conn, 'archive_months')
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS archive_months (
+        month TEXT PRIMARY KEY, start INTEGER, end INTEGER, rows INTEGER)"""
+    )
+    return not exists
+
+
+def invalidate(conn, since):
+    """Drop archived months that end after epoch "since".
+
+    Runs in the transaction of the caller.
+    """
+    conn.execute('DELETE FROM archive_months WHERE end > ?', (int(since),))
+
+
+def write_month(directory, df, month):
+    """Write the rows of one month to its file (atomic replace)."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp']).astype('datetime64[s]')
+    for column in df.columns.drop('timestamp'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    path = get_path(directory, month)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    feather.write_feather(
+        pa.Table.from_pandas(df, preserve_index=False), tmp,
+        compression='uncompressed',
+    )
+    os.replace(tmp, path)
+
+
+def compact(conn, directory, until=None):
+    """Archive every closed month that is not archived yet.
+
+    Args:
+        directory (str): archive directory.
+        until (int): epoch, months ending after it are left in the hot
+                     tail (default: start of the current month).
+
+    Returns:
+        list of archived months.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    create_tables(conn)
+    conn.commit()
+    if until is None:
+        until = get_month_bounds(
+            (pd.Timestamp.today() - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        )[1]
+    first = conn.execute('select min(epoch) from weather').fetchone()[0]
+    archived = {row[0] for row in conn.execute('select month from archive_months')}
+    months = []
+    while first is not None:
+        month, start, end = get_month_bounds(first)
+        if end > until:
+            break
+        if month not in archived:
+            df = pd.read_sql(
+                'select * from weather where epoch >= ? and epoch < ? order by epoch',
+                conn, params=(start, end),
+            )
+            if not df.empty:
+                write_month(directory, df, month)
+                conn.execute(
+                    'INSERT OR REPLACE INTO archive_months VALUES (?, ?, ?, ?)',
+                    (month, start, end, len(df))
+                )
+                conn.commit()
+                months.append(month)
+        first = conn.execute(
+            'select min(epoch) from weather where epoch >= ?', (end,)
+        ).fetchone()[0]
+    return months
+
+
+def get_archived_months(conn, start, end):
+    """Return [(month, month end)] archived without gaps from the month of start.
+
+    Stops at the first month that is not archived.
+    """
+    months = []
+    expected = get_month_bounds(start)[1]
+    for month, month_start, month_end in conn.execute(
+            """select month, start, end from archive_months
+            where end > ? and start <= ? order by start""", (start, end)):
+        if month_start != expected:
+            break
+        months.append((month, month_end))
+        expected = month_end
+    return months
+
+
+def read_months(directory, months, columns, start, end):
+    """Return an Arrow table of columns between start and end epochs.
+
+    The files are uncompressed and memory mapped, so only the pages of
+    the projected columns and rows are actually read.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    tables = []
+    for month, _ in months:
+        table = feather.read_table(get_path(directory, month), memory_map=True)
+        epoch = table.column('epoch').to_numpy()
+        lower = np.searchsorted(epoch, start, side='left')
+        upper = np.searchsorted(epoch, end, side='right')
+        table = table.slice(lower, upper - lower)
+        for column in columns:
+            if column not in table.column_names:
+                table = table.append_column(
+                    column, pa.nulls(len(table), type=pa.float64())
+                )
+        tables.append(table.select(list(columns)))
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def read(conn, directory, columns, start, end):
+    """Return columns between start and end epochs from archive and tail.
+
+    Returns None when the month of start (or of the first stored row, if
+    the period starts before it) is not archived, the caller then reads
+    SQLite only.
+    """
+    first = conn.execute('select min(epoch) from weather').fetchone()[0]
+    if first is None:
+        return None
+    months = get_archived_months(conn, max(start, first), end)
+    if not months:
+        return None
+    watermark = months[-1][1]
+    archived = read_months(directory, months, columns, start, end).to_pandas()
+    if watermark > end:
+        return archived
+    tail = pd.read_sql(
+        query.get_period_statement('weather', tuple(columns)),
+        conn,
+        params=(watermark, end),
+        parse_dates={'timestamp': schema.TIMESTAMP_FORMAT} if 'timestamp' in columns else None,
+    )
+    if tail.empty:
+        return archived
+    return pd.concat([archived, tail], ignore_index=True)
+
+
+if __name__ == '__main__':
+    from .handler import DataBaseHandler
+    if get_directory() is None:
+        raise SystemExit(f'Set {ENV_KEY} to the archive directory')
+    print(compact(DataBaseHandler().get_conn(), get_directory()))
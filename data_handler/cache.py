@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Data version token and a byte-budgeted LRU cache for serialized figures."""
+import os
+import time
+import threading
+import collections
+from pathlib import Path
+
+from .pool import ConnectionPool
+
+
+class DataVersion:
+    """Token that changes whenever new data is written to the database.
+
+    The token lives in a small file so that every process (eg. gunicorn
+    worker) sees the same version without touching the database.
+    """
+
+    def __init__(self, env_key='DATAVERSION', db_env_key='TSTWEATHERDB'):
+        self.env_key = env_key
+        self.db_env_key = db_env_key
+
+    @property
+    def path(self):
+        """Return path of the token file."""
+        path = os.getenv(self.env_key)
+        if path:
+            return Path(path)
+        db_path = os.getenv(self.db_env_key)
+        if db_path and db_path != ':memory:':
+            return Path(f'{db_path}.version')
+
+    def get(self):
+        """Return current token ("0" if data was never written)."""
+        path = self.path
+        try:
+            return path.read_text() if path else '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump(self):
+        """Set a new token."""
+        path = self.path
+        if path is None:
+            return
+        token = str(time.time_ns())
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp.write_text(token)
+        os.replace(tmp, path)
+        return token
+
+
+class MemoryBackend:
+    """In-process LRU store."""
+
+    def __init__(self):
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, created) or None."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def set(self, key, value, created, max_bytes):
+        """Store value, evict least recently used items above max_bytes."""
+        with self._lock:
+            self._data[key] = (value, created)
+            self._data.move_to_end(key)
+            total = sum(len(v) for v, _ in self._data.values())
+            while total > max_bytes and len(self._data) > 1:
+                _, (value, _) = self._data.popitem(last=False)
+                total -= len(value)
+
+    def size(self):
+        """Return (number of items, bytes)."""
+        with self._lock:
+            return len(self._data), sum(len(v) for v, _ in self._data.values())
+
+
+class SQLiteBackend:
+    """LRU store in a local SQLite file, shared by all worker processes."""
+
+    def __init__(self, env_key):
+        self.pool = ConnectionPool(env_key)
+        self._ready = False
+
+    def _conn(self):
+        conn = self.pool.connect()
+        if not self._ready:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS figure_cache (
+                key TEXT PRIMARY KEY, value BLOB, size INTEGER,
+                created REAL, accessed REAL)"""
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_figure_cache_accessed '
+                'ON figure_cache (accessed)'
+            )
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def get(self, key):
+        """Return (value, created) or None."""
+        conn = self._conn()
+        item = conn.execute(
+            'select value, created from figure_cache where key = ?', (key,)
+        ).fetchone()
+        if item is not None:
+            conn.execute(
+                'update figure_cache set accessed = ? where key = ?',
+                (time.time(), key)
+            )
+            conn.commit()
+        return item
+
+    def set(self, key, value, created, max_bytes):
+        """Store value, evict least recently used items above max_bytes."""
+        conn = self._conn()
+        conn.execute(
+            'insert or replace into figure_cache values (?, ?, ?, ?, ?)',
+            (key, value, len(value), created, created)
+        )
+        conn.execute(
+            """delete from figure_cache where key in (
+                select key from (
+                    select key, sum(size) over (order by accessed desc) as total
+                    from figure_cache
+                ) where total > ? and key != ?
+            )""",
+            (max_bytes, key)
+        )
+        conn.commit()
+
+    def size(self):
+        """Return (number of items, bytes)."""
+        return tuple(self._conn().execute(
+            'select count(*), coalesce(sum(size), 0) from figure_cache'
+        ).fetchone())
+
+
+class FigureCache:
+    """LRU cache of serialized figures with a byte budget.
+
+    Uses the SQLite file given by env_key when set, otherwise an
+    in-process store. Items older than max_age seconds count as misses,
+    since time windows move even if no new data arrives.
+    """
+
+    def __init__(self, env_key='FIGURECACHE', max_bytes=64 * 1024 ** 2, max_age=300):
+        self.env_key = env_key
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        """Return the storage backend."""
+        if self._backend is None:
+            if os.getenv(self.env_key):
+                self._backend = SQLiteBackend(self.env_key)
+            else:
+                self._backend = MemoryBackend()
+        return self._backend
+
+    def get(self, key):
+        """Return cached bytes or None."""
+        item = self.backend.get(key)
+        if item is None or time.time() - item[1] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[0]
+
+    def set(self, key, value):
+        """Store bytes under key."""
+        self.backend.set(key, value, time.time(), self.max_bytes)
+
+    def stats(self):
+        """Return hit/miss counters (this process) and cache size."""
+        nr_items, nr_bytes = self.backend.size()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'items': nr_items,
+            'bytes': nr_bytes,
+        }
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Ingest SMHI PMP3g point forecasts into the forecast database.
+
+    python -m data_handler.forecast [url or path to json]
+"""
+import sys
+import json
+import gzip
+import urllib.request
+import numpy as np
+import pandas as pd
+
+from .schema import TIMESTAMP_FORMAT, get_columns
+from .handler import get_forecast_db_conn
+
+
+SMHI_URL = (
+    'https://opendata-download-metfcst.smhi.se/api/category/pmp3g/version/2/'
+    'geotype/point/lon/{lon}/lat/{lat}/data.json'
+)
+STATION = dict(lat=57.386052, lon=12.295565)
+
+# SMHI parameter name -> forecast column.
+PARAMETER_MAPPER = dict(
+    t='outtemp',
+    r='outhumi',
+    ws='winsp',
+    gust='gust',
+    wd='windir',
+    msl='presrel',
+    pmean='rainh',
+    pmin='rainhmin',
+    pmax='rainhmax',
+)
+COLUMNS = list(PARAMETER_MAPPER.values())
+
+
+def load(source=None, timeout=30):
+    """Return the forecast json from a url or a local (gzipped) file."""
+    source = source or SMHI_URL.format(**STATION)
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=timeout) as response:
+            data = response.read()
+    else:
+        with open(source, 'rb') as fd:
+            data = fd.read()
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def get_frame(data, time_zone='Europe/Stockholm'):
+    """Return the forecast as one row per valid time and COLUMNS.
+
+    Timestamps are converted from UTC to local wall-clock time, the same
+    as for the observations.
+    """
+    series = data.get('timeSeries', [])
+    parameters = [p for step in series for p in step['parameters']]
+    rows = np.repeat(
+        np.arange(len(series)), [len(step['parameters']) for step in series]
+    )
+    codes = pd.Index(list(PARAMETER_MAPPER)).get_indexer(
+        [p['name'] for p in parameters]
+    )
+    values = np.array([p['values'][0] for p in parameters], dtype=np.float64)
+    valid = codes >= 0
+    matrix = np.full((len(series), len(COLUMNS)), np.nan)
+    matrix[rows[valid], codes[valid]] = values[valid]
+    df = pd.DataFrame(
+        matrix, columns=COLUMNS,
+        index=pd.Index([step['validTime'] for step in series]),
+    )
+    time = pd.to_datetime(df.index, utc=True).tz_convert(time_zone).tz_localize(None)
+    df.index = time.strftime(TIMESTAMP_FORMAT)
+    df.index.name = 'timestamp'
+    # The repeated local hour when leaving daylight saving time.
+    df = df.loc[~df.index.duplicated(keep='last')]
+    return df.sort_index().astype(np.float64)
+
+
+def create_tables(conn):
+    """Prepare the forecast database for delta updates."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS forecast (
+        timestamp TEXT, {', '.join(f'{c} REAL' for c in COLUMNS)},
+        issue_time TEXT)"""
+    )
+    columns = get_columns(conn, 'forecast')
+    for column in [*COLUMNS, 'issue_time']:
+        if column not in columns:
+            kind = 'TEXT' if column == 'issue_time' else 'REAL'
+            conn.execute(f'ALTER TABLE forecast ADD COLUMN {column} {kind}')
+    # Keep the latest row of any duplicated timestamp before adding the key.
+    conn.execute(
+        """DELETE FROM forecast WHERE rowid NOT IN (
+            SELECT max(rowid) FROM forecast GROUP BY timestamp)"""
+    )
+    conn.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_forecast_timestamp '
+        'ON forecast (timestamp)'
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS forecast_runs (
+        issue_time TEXT PRIMARY KEY, approved_time TEXT, nr_changed INTEGER)"""
+    )
+    conn.commit()
+
+
+def get_latest_issue_time(conn):
+    """Return issue time of the newest stored model run."""
+    return conn.execute('select max(issue_time) from forecast_runs').fetchone()[0]
+
+
+def get_changed_rows(conn, df):
+    """Return the rows of df that are new or differ from the stored ones."""
+    stored = pd.read_sql(
+        f"""select timestamp, {', '.join(COLUMNS)} from forecast
+        where timestamp between ? and ?""",
+        conn, params=(df.index[0], df.index[-1]), index_col='timestamp'
+    ).reindex(index=df.index, columns=COLUMNS).astype(np.float64)
+    new = df.to_numpy()
+    old = stored.to_numpy()
+    same = np.isclose(new, old, rtol=0, atol=1e-9) | (np.isnan(new) & np.isnan(old))
+    return df.loc[~same.all(axis=1)]
+
+
+def ingest(data, conn=None, time_zone='Europe/Stockholm'):
+    """Upsert the rows of a forecast that changed since the stored run.
+
+    Returns:
+        dict with issue_time and counts of received and changed rows,
+        "skipped" is True if the run is not newer than the stored one.
+    """
+    conn = conn or get_forecast_db_conn()
+    create_tables(conn)
+    issue_time = data.get('referenceTime') or data.get('approvedTime')
+    df = get_frame(data, time_zone=time_zone)
+    result = {'issue_time': issue_time, 'received': len(df), 'changed': 0,
+              'skipped': False}
+    latest = get_latest_issue_time(conn)
+    if df.empty or (latest is not None and issue_time <= latest):
+        result['skipped'] = True
+        return result
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        changed = get_changed_rows(conn, df)
+        rows = [
+            (timestamp, *(None if np.isnan(v) else float(v) for v in values), issue_time)
+            for timestamp, values in zip(changed.index, changed.to_numpy())
+        ]
+        targets = ['timestamp', *COLUMNS, 'issue_time']
+        assignments = ', '.join(f'{c} = excluded.{c}' for c in targets[1:])
+        conn.executemany(
+            f"""INSERT INTO forecast ({', '.join(targets)})
+            VALUES ({', '.join('?' * len(targets))})
+            ON CONFLICT(timestamp) DO UPDATE SET {assignments}""",
+            rows
+        )
+        conn.execute(
+            'INSERT INTO forecast_runs VALUES (?, ?, ?)',
+            (issue_time, data.get('approvedTime'), len(rows))
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    result['changed'] = len(rows)
+    return result
+
+
+if __name__ == '__main__':
+    print(ingest(load(sys.argv[1] if len(sys.argv) > 1 else None)))
@@ -4,12 +4,25 @@ Created on 2021-11-27 09:52
 
 @author: johannes
 """
-import os
 from pathlib import Path
-import yaml
 import sqlite3
+import yaml
+import numpy as np
 import pandas as pd
 
+from .pool import ConnectionPool
+from .schema import (
+    TIMESTAMP_FORMAT,
+    migrate,
+    is_migrated,
+    table_exists,
+    create_weather_table,
+    get_columns,
+)
+from .ingest import get_frame
+from .cache import DataVersion
+from . import rollup, rainy, query, archive, metrics, windy, windcube
+
 
 DAYS_MAPPER = {
     'day':  1,
@@ -21,10 +34,47 @@ DAYS_MAPPER = {
     'fullyear': 365,
 }
 
+DB_POOL = ConnectionPool('TSTWEATHERDB')
+FORECAST_POOL = ConnectionPool('FORECASTDB')
+
 
 def get_db_conn():
-    """Doc."""
-    return sqlite3.connect(os.getenv('TSTWEATHERDB'))
+    """Return the pooled connection to the weather database."""
+    return DB_POOL.connect()
+
+
+def to_epoch(timestamp):
+    """Return the wall-clock timestamp as seconds since 1970-01-01 (int).
+
+    Time zone information is dropped, not converted, which matches the
+    "epoch" column of the weather table.
+    """
+    timestamp = pd.Timestamp(timestamp).tz_localize(None)
+    return int((timestamp - pd.Timestamp(0)) // pd.Timedelta(seconds=1))
+
+
+def get_parse_dates(columns, timestamp_format=TIMESTAMP_FORMAT):
+    """Return pd.read_sql "parse_dates" for the selected columns."""
+    if 'timestamp' in columns:
+        return {'timestamp': timestamp_format}
+
+
+def to_wall_clock(series, time_zone):
+    """Return datetime series as naive local wall-clock time.
+
+    Time zone aware series (eg. UTC) are converted for the whole column
+    at once, naive series are returned as they are.
+    """
+    if series.dt.tz is not None:
+        return series.dt.tz_convert(time_zone).dt.tz_localize(None)
+    return series
+
+
+def get_nr_days(period, time_zone=None):
+    """Return the length of the period in days."""
+    if period == 'thisyear':
+        return pd.Timestamp.today(tz=time_zone or 'Europe/Stockholm').dayofyear
+    return DAYS_MAPPER.get(period, 1)
 
 
 def get_start_time(period, time_zone=None):
@@ -53,25 +103,117 @@ class DataBaseHandler:
         self._start_time = None
         self._end_time = None
         self._app_timing = None
+        self._schema_ready = False
+        self.data_version = DataVersion()
+        self._snapshot = None
+        self.archive_dir = archive.get_directory()
 
-    def post(self, **kwargs):
-        """Doc."""
-        df = pd.DataFrame(
-            {field: item for field, item in kwargs.items() if field in self.db_fields}
-        )
+    def get_conn(self):
+        """Return the pooled connection, check if the schema is migrated.
+
+        Reads of derived tables (rollups, wind histograms, archive) are
+        only used on a migrated database, see migrate.
+        """
         conn = get_db_conn()
-        df.to_sql('weather', conn, if_exists='append', index=False)
+        if not self._schema_ready:
+            self._schema_ready = is_migrated(conn)
+        return conn
+
+    def migrate(self):
+        """Migrate the database to the current schema, see schema.migrate.
+
+        Backfills the derived tables of an existing database, which takes
+        a while on a long history. Run it offline, not per request.
+        """
+        self._schema_ready = migrate(get_db_conn())
+        return self._schema_ready
+
+    def post(self, **kwargs):
+        """Insert one record (one value or list of values per field)."""
+        df, _ = get_frame([kwargs], self.db_fields)
+        return self.insert_frame(df)
 
+    def post_many(self, records):
+        """Insert a batch of records, see ingest.get_frame.
+
+        Returns:
+            dict with counts of received, inserted, duplicate and
+            rejected rows.
+        """
+        df, nr_rejected = get_frame(records, self.db_fields)
+        nr_inserted = self.insert_frame(df)
+        return {
+            'received': len(df) + nr_rejected,
+            'inserted': nr_inserted,
+            'duplicates': len(df) - nr_inserted,
+            'rejected': nr_rejected,
+        }
+
+    @metrics.timed('db.insert')
+    def insert_frame(self, df):
+        """Insert rows (with "epoch") in one transaction.
+
+        Rows with a timestamp that is already stored are skipped, which
+        makes repeated uploads of the same records harmless.
+
+        Returns:
+            number of inserted rows.
+        """
+        if df.empty:
+            return 0
+        conn = self.get_conn()
+        if not self._schema_ready:
+            if table_exists(conn, 'weather'):
+                raise RuntimeError(
+                    'The weather database is not migrated, '
+                    'run: python -m data_handler.schema'
+                )
+            # First record of a new database, nothing to backfill.
+            create_weather_table(conn, sorted(self.db_fields))
+            self._schema_ready = migrate(conn)
+
+        columns = [c for c in get_columns(conn, 'weather') if c in df]
+        df = df.drop_duplicates('epoch', keep='last')
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = {row[0] for row in conn.execute(
+                'select epoch from weather where epoch between ? and ?',
+                (int(df['epoch'].min()), int(df['epoch'].max()))
+            )}
+            df = df.loc[~df['epoch'].isin(existing), columns]
+            values = df.astype(object).where(df.notna(), None).values.tolist()
+            conn.executemany(
+                f"""INSERT INTO weather ({', '.join(columns)})
+                VALUES ({', '.join('?' * len(columns))})""",
+                values
+            )
+            rollup.update(conn, df)
+            rainy.update(conn, df)
+            windcube.update(conn, df)
+            if len(df):
+                archive.invalidate(conn, df['epoch'].min())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if len(df):
+            self._snapshot = None
+            self.data_version.bump()
+        return len(df)
+
+    @metrics.timed('db.data_for_time_period')
     def get_data_for_time_period(self):
         """Doc."""
-        conn = get_db_conn()
+        conn = self.get_conn()
         return pd.read_sql(
-            """select * from weather where timestamp between 
-            '"""+self.start_time+"""%' and '"""+self.end_time+"""%'""",
-            conn
+            'select * from weather where epoch between ? and ?',
+            conn,
+            params=(to_epoch(self.start_time), to_epoch(self.end_time)),
         )
 
-    def get_parameter_data_for_time_period(self, *args, time_period='day'):
+    @metrics.timed('db.parameter_data')
+    def get_parameter_data_for_time_period(self, *args, time_period='day',
+                                           resolution='auto'):
         """Return dataframe based on parameter list.
 
         Args:
@@ -79,17 +221,87 @@ class DataBaseHandler:
                         Eg. ('timestamp', 'outtemp', 'winsp')
             time_period (str): period according to TIMING_OPTIONS
                                (eg. "day", "week" or "month").
+            resolution (str): "raw", "hourly", "daily" or "auto". "auto"
+                              picks the coarsest rollup the period needs.
+
+        Raw reads, which includes long periods of parameters that can not be
+        rolled up (rollup.RAW_ONLY, eg. the wind direction chart over a
+        year), take the closed months from the archive when it is enabled.
         """
-        para_list = ', '.join(args)
-        start_time = get_start_time(time_period, time_zone=self.time_zone)
-        end_time = pd.Timestamp.today(tz=self.time_zone).strftime('%Y-%m-%d %H:%M:%S')
-        conn = get_db_conn()
+        columns = query.validate_columns(args, self.db_fields | {'epoch'})
+        start = to_epoch(get_start_time(time_period, time_zone=self.time_zone))
+        end = to_epoch(self.today)
+        conn = self.get_conn()
+        if resolution == 'auto':
+            resolution = rollup.get_resolution(
+                columns, get_nr_days(time_period, time_zone=self.time_zone)
+            )
+        if resolution != 'raw' and self._schema_ready:
+            return rollup.read(conn, columns, start, end, resolution)
+        if self.archive_dir and self._schema_ready:
+            df = archive.read(conn, self.archive_dir, columns, start, end)
+            if df is not None:
+                return df
+
+        return pd.read_sql(
+            query.get_period_statement('weather', columns),
+            conn,
+            params=(start, end),
+            parse_dates=get_parse_dates(columns),
+        )
+
+    @metrics.timed('db.parameter_data_since')
+    def get_parameter_data_since(self, *args, since):
+        """Return raw rows of the parameters stored after epoch "since".
+
+        Cost scales with the number of new rows (index range on epoch).
+        """
+        columns = query.validate_columns(args, self.db_fields | {'epoch'})
         return pd.read_sql(
-            f"""select {para_list} from weather where timestamp between 
-            '"""+start_time+"""' and '"""+end_time+"""'""",
-            conn
+            query.get_since_statement('weather', columns),
+            self.get_conn(),
+            params=(int(since),),
+            parse_dates=get_parse_dates(columns),
+        )
+
+    @metrics.timed('db.rain_totals')
+    def get_rain_totals(self, parameter, time_period='day'):
+        """Return stored rain totals of the periods within time_period.
+
+        Args:
+            parameter (str): rain counter, one of rainy.RAIN_MAPPER
+                             (rainh: hourly totals, raind: daily, etc.).
+            time_period (str): period according to TIMING_OPTIONS.
+        """
+        if parameter not in rainy.RAIN_MAPPER:
+            raise ValueError(f'Not a rain counter: {parameter}')
+        conn = self.get_conn()
+        return rainy.read(
+            conn, parameter,
+            to_epoch(get_start_time(time_period, time_zone=self.time_zone)),
+            to_epoch(self.today),
         )
 
+    @metrics.timed('db.wind_rose')
+    def get_wind_rose(self, parameter='winsp', time_period='day'):
+        """Return the wind rose frequency table of time_period.
+
+        Summed from the daily wind histograms (see windcube).
+
+        Args:
+            parameter (str): "winsp" (mean wind) or "gust".
+            time_period (str): period according to TIMING_OPTIONS.
+        """
+        conn = self.get_conn()
+        if not self._schema_ready:
+            return windy.get_wind_rose_from_counts([], [], [])
+        directions, floors, counts = windcube.read(
+            conn, parameter,
+            to_epoch(get_start_time(time_period, time_zone=self.time_zone)),
+            to_epoch(self.today),
+        )
+        return windy.get_wind_rose_from_counts(directions, floors, counts)
+
     @staticmethod
     def get():
         """Doc."""
@@ -103,36 +315,87 @@ class DataBaseHandler:
         query = """select timestamp from weather"""
         return pd.read_sql(query, conn).timestamp.to_list()
 
+    def iter_time_log(self, since=None, until=None, chunk_size=10000):
+        """Return an iterator of (timestamp, epoch) row chunks ordered by time.
+
+        since and until are parsed at once, so a bad value raises
+        ValueError before the first chunk is read (eg. before a streamed
+        response has started).
+
+        Args:
+            since (str): first timestamp to include (default: all).
+            until (str): last timestamp to include (default: all).
+            chunk_size (int): rows per chunk.
+        """
+        bounds = (
+            to_epoch(since) if since else -2 ** 63,
+            to_epoch(until) if until else 2 ** 63 - 1,
+        )
+        return self._iter_time_log(bounds, chunk_size)
+
+    def _iter_time_log(self, bounds, chunk_size):
+        """Yield chunks of (timestamp, epoch) rows between two epochs."""
+        conn = self.get_conn()
+        if not self._schema_ready:
+            # No (migrated) weather table yet, an empty log.
+            return
+        cursor = conn.execute(
+            """select timestamp, epoch from weather
+            where epoch between ? and ? order by epoch""",
+            bounds
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    @metrics.timed('db.recent_time_log')
     def get_recent_time_log(self):
-        """Doc."""
-        conn = get_db_conn()
+        """Return timestamps of yesterday and today."""
+        conn = self.get_conn()
         return pd.read_sql(
-            """select timestamp from weather where (timestamp like '"""+self.date_today+"""%' 
-            or timestamp like '"""+self.date_yesterday+"""%')""",
-            conn
+            'select timestamp from weather where epoch >= ? and epoch < ?',
+            conn,
+            params=(
+                to_epoch(self.date_yesterday),
+                to_epoch(self.date_today) + 86400,
+            ),
         ).timestamp.to_list()
 
-    @staticmethod
-    def get_last_timestamp():
-        """Doc."""
-        conn = get_db_conn()
-        try:
-            return pd.read_sql(
-                'select timestamp from weather order by rowid desc limit 1', conn
-            )['timestamp'][0]
-        except IndexError:
-            return None
+    def get_latest_snapshot(self):
+        """Return the most recent observation as {field: value}.
+
+        The row is read once and then served from memory until new data
+        is written (by any process, see DataVersion).
+        """
+        version = self.data_version.get()
+        if self._snapshot is None or self._snapshot[0] != version:
+            conn = self.get_conn()
+            snapshot = {}
+            if self._schema_ready:
+                cursor = conn.execute(query.get_latest_statement('weather'))
+                row = cursor.fetchone()
+                if row is not None:
+                    snapshot = dict(zip((c[0] for c in cursor.description), row))
+            self._snapshot = (version, snapshot)
+        return self._snapshot[1]
+
+    def get_last_timestamp(self):
+        """Return timestamp of the most recent observation."""
+        return self.get_latest_snapshot().get('timestamp')
+
+    def get_last_parameter_value(self, parameter):
+        """Return the most recent value of parameter."""
+        return self.get_latest_snapshot().get(parameter)
 
     @staticmethod
-    def get_last_parameter_value(parameter):
-        """Doc."""
-        conn = get_db_conn()
-        try:
-            return pd.read_sql(
-                f'select {parameter} from weather order by rowid desc limit 1', conn
-            )[parameter][0]
-        except IndexError:
-            return None
+    def get_connection_stats():
+        """Return open/reuse counters of the connection pool."""
+        return DB_POOL.stats()
 
     @property
     def today(self):
@@ -195,9 +458,21 @@ class DataBaseHandler:
         self._app_timing = timing
 
 
+def get_file_state(path):
+    """Return (mtime_ns, size) of the database and its write-ahead log."""
+    state = []
+    for name in (path, f'{path}-wal'):
+        try:
+            stat = Path(name).stat()
+            state.extend((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            state.extend((None, None))
+    return tuple(state)
+
+
 def get_forecast_db_conn():
-    """Doc."""
-    return sqlite3.connect(os.getenv('FORECASTDB'))
+    """Return the pooled connection to the forecast database."""
+    return FORECAST_POOL.connect()
 
 
 class ForecastHandler:
@@ -209,25 +484,75 @@ class ForecastHandler:
 
     def __init__(self, time_zone=None):
         self.time_zone = time_zone or 'Europe/Stockholm'
+        self._store = (None, {})
+
+    def get_run_id(self, conn):
+        """Return a cheap identifier of the stored model run.
 
+        The newest issue time if the forecast was ingested by
+        data_handler.forecast. Otherwise the row count and max rowid of the
+        forecast table together with the modification time and size of the
+        database files, which (unlike PRAGMA data_version) can be compared
+        between connections.
+        """
+        try:
+            return conn.execute(
+                'select max(issue_time) from forecast_runs'
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            rows = conn.execute(
+                'select count(*), max(rowid) from forecast'
+            ).fetchone()
+            return (*rows, *get_file_state(FORECAST_POOL.path))
+
+    def get_store(self):
+        """Return the current run as {column: numpy array}.
+
+        "epoch" (wall-clock seconds, sorted) is used to slice time windows.
+        The forecast is only read again when a new run is detected.
+        """
+        conn = get_forecast_db_conn()
+        run_id = self.get_run_id(conn)
+        if run_id is None or run_id != self._store[0]:
+            start = get_start_time('days3', time_zone=self.time_zone)
+            with metrics.timer('forecast.load') as frame:
+                df = pd.read_sql(
+                    'select * from forecast where timestamp >= ? order by timestamp',
+                    conn, params=(start,),
+                ).drop(columns='issue_time', errors='ignore')
+                frame['rows'] = len(df)
+            time = to_wall_clock(pd.to_datetime(df['timestamp']), self.time_zone)
+            store = {
+                column: df[column].to_numpy(dtype=np.float64)
+                for column in df.columns.drop('timestamp')
+            }
+            store['timestamp'] = time.to_numpy(dtype='datetime64[s]')
+            store['epoch'] = store['timestamp'].astype(np.int64)
+            self._store = (run_id, store)
+        return self._store[1]
+
+    @metrics.timed('forecast.parameter_data')
     def get_parameter_data_for_time_period(self, *args, time_period='day'):
         """Return dataframe based on parameter list.
 
+        Served from the in-memory store of the current model run.
+
         Args:
             args (str): iterable of parameters.
                         Eg. ('timestamp', 'outtemp', 'winsp')
             time_period (str): period according to TIMING_OPTIONS
                                (eg. "day", "days3").
         """
-        para_list = ', '.join(args)
-        start_time = get_start_time(time_period, time_zone=self.time_zone)
+        store = self.get_store()
+        columns = query.validate_columns(args, store)
+        start = to_epoch(get_start_time(time_period, time_zone=self.time_zone))
         end_time = self.get_endtime(time_period)
-        conn = get_forecast_db_conn()
-        return pd.read_sql(
-            f"""select {para_list} from forecast where timestamp between 
-            '"""+start_time+"""' and '"""+end_time+"""'""",
-            conn
-        )
+        end = to_epoch(end_time) if end_time else np.iinfo(np.int64).max
+        lower = np.searchsorted(store['epoch'], start, side='left')
+        upper = np.searchsorted(store['epoch'], end, side='right')
+        return pd.DataFrame({
+            column: store[column][lower:upper] for column in columns
+        })
 
     def get_endtime(self, time_period):
         """Doc."""
@@ -236,6 +561,11 @@ class ForecastHandler:
         elif time_period == 'days3':
             return (self.today + pd.Timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
 
+    @staticmethod
+    def get_connection_stats():
+        """Return open/reuse counters of the connection pool."""
+        return FORECAST_POOL.stats()
+
     @property
     def today(self):
         """Return pandas TimeStamp for today."""
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Parsing and validation of uploaded weather records."""
+import gzip
+import json
+import pandas as pd
+
+from .schema import TIMESTAMP_FORMAT
+
+
+def decode_body(data, content_encoding=None):
+    """Return the request body, gunzipped if needed."""
+    if content_encoding == 'gzip' or data[:2] == b'\x1f\x8b':
+        return gzip.decompress(data)
+    return data
+
+
+def parse_records(data):
+    """Return a list of records from a JSON array, object or NDJSON body.
+
+    Raises ValueError if the body is not JSON or neither an array nor an
+    object (eg. a number or a string).
+    """
+    text = data.decode('utf-8').strip()
+    if not text:
+        return []
+    try:
+        records = json.loads(text)
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list):
+        raise ValueError('Expected a JSON array or object')
+    return records
+
+
+def get_frame(records, db_fields):
+    """Return validated records as a dataframe ready for the weather table.
+
+    A record holds one value per field, or one list per field (as sent to
+    /import/). Fields not in db_fields are dropped. Rows without a valid
+    timestamp, or with a value that is not numeric, are rejected.
+
+    Raises ValueError if records is not a list or if the lists of a record
+    differ in length.
+
+    Returns:
+        (df, nr_rejected)
+    """
+    if not isinstance(records, list):
+        raise ValueError('Expected a list of records')
+    rows = []
+    nr_rejected = 0
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            nr_rejected += 1
+            continue
+        values = {field: item for field, item in record.items() if field in db_fields}
+        lists = [item for item in values.values() if isinstance(item, list)]
+        if lists:
+            if len({len(item) for item in lists}) > 1:
+                raise ValueError(f'Record {i}: list fields differ in length')
+            rows.extend(pd.DataFrame(values).to_dict('records'))
+        else:
+            rows.append(values)
+
+    columns = list(dict.fromkeys(field for row in rows for field in row))
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    if 'timestamp' not in df:
+        return df.iloc[0:0].assign(epoch=pd.Series(dtype='int64')), nr_rejected + len(df)
+
+    time = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT, errors='coerce')
+    valid = time.notna()
+    for field in df.columns.drop('timestamp'):
+        values = pd.to_numeric(df[field], errors='coerce')
+        valid &= values.notna() | df[field].isna()
+        df[field] = values
+    nr_rejected += int((~valid).sum())
+    df = df.loc[valid].reset_index(drop=True)
+    time = time.loc[valid].reset_index(drop=True)
+    df['timestamp'] = time.dt.strftime(TIMESTAMP_FORMAT)
+    df['epoch'] = (time - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return df, nr_rejected
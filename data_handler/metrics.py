@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Stage timings and row counts, exposed in the Prometheus text format.
+
+Counters are kept per process (ie. per gunicorn worker).
+
+Slow query log (optional): with SLOWQUERYLOG set to a file path, every
+timed stage slower than SLOWQUERYSECONDS (default 0.5) appends one JSON
+line with the stage, its duration and the SQL statements (with bound
+parameters) it executed.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+import contextlib
+import collections
+
+
+SECONDS_BUCKETS = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.
+)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class Histogram:
+    """Cumulative histogram with one label ("stage")."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._data = collections.defaultdict(
+            lambda: [[0] * len(self.buckets), 0., 0]
+        )
+
+    def observe(self, value, stage):
+        """Add one observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, _, _ = item = self._data[stage]
+            if index < len(counts):
+                counts[index] += 1
+            item[1] += value
+            item[2] += 1
+
+    def render(self):
+        """Return lines in the Prometheus text format."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            items = sorted(
+                (stage, list(counts), total, count)
+                for stage, (counts, total, count) in self._data.items()
+            )
+        for stage, counts, total, count in items:
+            cumulative = 0
+            for bound, nr in zip(self.buckets, counts):
+                cumulative += nr
+                lines.append(
+                    f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'weather_stage_seconds', 'Duration of a stage (seconds).', SECONDS_BUCKETS
+)
+STAGE_ROWS = Histogram(
+    'weather_stage_rows', 'Rows returned or written by a stage.', ROWS_BUCKETS
+)
+
+_local = threading.local()
+
+
+def get_slow_log():
+    """Return (path, threshold seconds) of the slow query log, or None."""
+    path = os.getenv('SLOWQUERYLOG')
+    if path:
+        return path, float(os.getenv('SLOWQUERYSECONDS', 0.5))
+
+
+def trace_statement(statement):
+    """sqlite3 trace callback, collects statements of the running stages."""
+    for frame in getattr(_local, 'stack', ()):
+        frame['statements'].append(statement)
+
+
+def count_rows(result):
+    """Return number of rows of a result (None if not applicable).
+
+    Tuples are (Flask or Dash) return values, not rows.
+    """
+    if isinstance(result, (bool, dict, tuple, str, bytes)):
+        return None
+    if isinstance(result, int):
+        return result
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+@contextlib.contextmanager
+def timer(stage):
+    """Time the block, set "rows" of the yielded dict to record a row count."""
+    stack = _local.__dict__.setdefault('stack', [])
+    frame = {'rows': None, 'statements': []}
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield frame
+    finally:
+        duration = time.perf_counter() - start
+        stack.remove(frame)
+        STAGE_SECONDS.observe(duration, stage)
+        if frame['rows'] is not None:
+            STAGE_ROWS.observe(frame['rows'], stage)
+        slow_log = get_slow_log()
+        if slow_log and duration >= slow_log[1] and frame['statements']:
+            with open(slow_log[0], 'a') as fd:
+                fd.write(json.dumps({
+                    'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'stage': stage,
+                    'seconds': round(duration, 6),
+                    'statements': frame['statements'],
+                }) + '\n')
+
+
+def timed(stage):
+    """Decorator, time each call and count the rows of the result."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage) as frame:
+                result = func(*args, **kwargs)
+                frame['rows'] = count_rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _time_stream(stage, chunks, start):
+    """Yield chunks, record the stage once the stream is sent (or closed)."""
+    try:
+        yield from chunks
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def timed_route(stage):
+    """Decorator for Flask views, time each request (no row count).
+
+    A streamed response is timed until its body has been sent.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            streamed = False
+            try:
+                result = func(*args, **kwargs)
+                response = result[0] if isinstance(result, tuple) else result
+                if getattr(response, 'is_streamed', False):
+                    response.response = _time_stream(stage, response.response, start)
+                    streamed = True
+                return result
+            finally:
+                if not streamed:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+        return wrapper
+    return decorator
+
+
+def render(gauges=None):
+    """Return all metrics (and gauges {name: value}) as Prometheus text."""
+    lines = STAGE_SECONDS.render() + STAGE_ROWS.render()
+    for name, value in (gauges or {}).items():
+        if value is None:
+            continue
+        lines += [f'# TYPE {name} gauge', f'{name} {float(value)}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""SQLite connection pool."""
+import os
+import atexit
+import sqlite3
+import weakref
+import threading
+
+from . import metrics
+
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 268435456),
+    ('cache_size', -16000),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+
+class ConnectionPool:
+    """Per-process pool of long-lived SQLite connections.
+
+    Each thread gets its own connection per database path, which is then
+    reused for every following query in that thread and closed when the
+    thread ends. Connections are opened with WAL journaling and the
+    pragmas in PRAGMAS. A forked child (eg. a gunicorn worker) never
+    reuses the connections of its parent.
+    """
+
+    def __init__(self, env_key, pragmas=PRAGMAS, cached_statements=256):
+        self.env_key = env_key
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.close_all)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._connections = []
+        self.opens = 0
+        self.reuses = 0
+
+    @property
+    def path(self):
+        """Return database path from the environment."""
+        return os.getenv(self.env_key)
+
+    def connect(self):
+        """Return the connection of the calling thread, open it if needed."""
+        if self._pid != os.getpid():
+            self._reset()
+        path = self.path
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = self._local.holder = _ThreadConnections(self)
+        connections = holder.connections
+        conn = connections.get(path)
+        if conn is not None:
+            with self._lock:
+                self.reuses += 1
+            return conn
+
+        conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for pragma, value in self.pragmas:
+            conn.execute(f'PRAGMA {pragma}={value}')
+        if metrics.get_slow_log():
+            conn.set_trace_callback(metrics.trace_statement)
+        connections[path] = conn
+        with self._lock:
+            self._connections.append(conn)
+            self.opens += 1
+        return conn
+
+    def _release(self, pid, connections):
+        """Close the connections of a finished thread."""
+        if pid != os.getpid():
+            # Inherited from the parent process, which still owns them.
+            return
+        with self._lock:
+            self._connections = [
+                conn for conn in self._connections
+                if all(conn is not c for c in connections.values())
+            ]
+        for conn in connections.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close_all(self):
+        """Close every connection opened by this process."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        """Return connection counters for this process."""
+        return {
+            'opens': self.opens,
+            'reuses': self.reuses,
+            'open_connections': len(self._connections),
+        }
+
+
+class _ThreadConnections:
+    """Connections of one thread, released by the pool when the thread ends."""
+
+    def __init__(self, pool):
+        self.connections = {}
+        weakref.finalize(self, pool._release, os.getpid(), self.connections)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+SQL statements for time window queries.
+
+Column names are checked against a whitelist and time bounds are always
+bound as parameters, so the text of a statement only depends on its shape
+(table and columns) and is found in the statement cache of the pooled
+connection (see pool.ConnectionPool).
+"""
+
+
+def validate_columns(columns, allowed):
+    """Return columns as a tuple, raise ValueError for unknown names."""
+    columns = tuple(columns)
+    unknown = [c for c in columns if c not in allowed]
+    if unknown or not columns:
+        raise ValueError(f'Unknown or missing columns: {unknown}')
+    return columns
+
+
+def get_period_statement(table, columns):
+    """Return select statement of columns between two bound epochs."""
+    return (
+        f'select {", ".join(columns)} from {table} '
+        'where epoch between ? and ? order by epoch'
+    )
+
+
+def get_since_statement(table, columns):
+    """Return select statement of columns after one bound epoch."""
+    return (
+        f'select {", ".join(columns)} from {table} '
+        'where epoch > ? order by epoch'
+    )
+
+
+def get_latest_statement(table):
+    """Return select statement of the most recent row."""
+    return f'select * from {table} order by epoch desc limit 1'
+
@@ -3,23 +3,209 @@
 Created on 2022-01-29 15:27
 
 @author: johannes
+
+Rain totals per hour, day, week, month and year, computed from the
+cumulative rain counters of the station (rainh, raind, rainw, rainm,
+raint). Each counter restarts at zero at some point, the total of a
+period is the sum of the counter increments within it, where a
+decreasing counter is taken as a reset.
+
+Rebuild the stored totals from the full history with:
+    python -m data_handler.rainy
 """
+import numpy as np
+import pandas as pd
+
+from . import schema
+
 
 RAIN_MAPPER = {
-    'rainh': ['date', 'hour'],
-    'raind': ['date'],
-    'rainw': ['week'],
-    'rainm': ['month'],
-    'raint': ['year']
+    'rainh': 'h',
+    'raind': 'D',
+    'rainw': 'W',
+    'rainm': 'M',
+    'raint': 'Y',
 }
 
 
+def get_increments(values, previous=np.nan):
+    """Return the increments of a cumulative counter.
+
+    Args:
+        values (array): counter values in time order (NaN allowed).
+        previous (float): counter value before the first one, if known.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    before = pd.Series(np.append(previous, values)).ffill().to_numpy()[:-1]
+    increments = values - before
+    reset = np.isnan(before) | (increments < 0)
+    increments[reset] = values[reset]
+    increments[np.isnan(values)] = 0.
+    return increments.round(6)
+
+
+def get_bucket_starts(epoch, parameter):
+    """Return start epoch of the period each epoch belongs to."""
+    time = pd.to_datetime(np.asarray(epoch), unit='s')
+    start = pd.Series(time).dt.to_period(RAIN_MAPPER[parameter]).dt.start_time
+    return ((start - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy()
+
+
+def get_totals(epoch, values, parameter, previous=np.nan):
+    """Return a series of period totals indexed by period start epoch."""
+    increments = get_increments(values, previous=previous)
+    return pd.Series(increments).groupby(
+        get_bucket_starts(epoch, parameter)
+    ).sum().round(6)
+
+
 def get_rainframe(df, parameter):
-    """Return a grouped dataframe based on the timing attribute."""
-    if not df.empty:
-        return df.groupby(
-            [df['timestamp'].dt.__getattribute__(t_spec)
-             for t_spec in RAIN_MAPPER.get(parameter)]
-        ).max().reset_index(drop=True)
-    else:
+    """Return totals of parameter per period of the timing attribute.
+
+    Batch version of the stored totals, for a dataframe with datetime
+    "timestamp" and the counter column "parameter".
+    """
+    if df.empty:
         return df
+    epoch = (df['timestamp'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    totals = get_totals(epoch.to_numpy(), df[parameter].to_numpy(), parameter)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(totals.index.to_numpy(), unit='s'),
+        parameter: totals.to_numpy(),
+    })
+
+
+def create_tables(conn):
+    """Create tables for totals. Return True if they did not exist before."""
+    exists = schema.table_exists(conn, 'rain_totals')
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS rain_totals (
+        parameter TEXT, bucket INTEGER, total REAL,
+        PRIMARY KEY (parameter, bucket))"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS rain_state (
+        parameter TEXT PRIMARY KEY, epoch INTEGER, value REAL)"""
+    )
+    return not exists
+
+
+def get_parameters(conn):
+    """Return rain counters available in the weather table."""
+    columns = schema.get_columns(conn, 'weather')
+    return [p for p in RAIN_MAPPER if p in columns]
+
+
+def _store(conn, parameter, totals, accumulate):
+    """Write totals, either added to or replacing stored ones."""
+    if accumulate:
+        statement = """INSERT INTO rain_totals VALUES (?, ?, ?)
+            ON CONFLICT(parameter, bucket) DO UPDATE
+            SET total = round(total + excluded.total, 6)"""
+    else:
+        statement = 'INSERT OR REPLACE INTO rain_totals VALUES (?, ?, ?)'
+    conn.executemany(
+        statement,
+        [(parameter, int(b), float(t)) for b, t in totals.items()]
+    )
+
+
+def _store_state(conn, parameter, epoch, values):
+    """Store the last known counter value."""
+    valid = ~np.isnan(values)
+    if valid.any():
+        conn.execute(
+            'INSERT OR REPLACE INTO rain_state VALUES (?, ?, ?)',
+            (parameter, int(epoch[valid][-1]), float(values[valid][-1]))
+        )
+
+
+def backfill(conn, since=None):
+    """Recompute stored totals (vectorised) from the weather table.
+
+    Args:
+        since (int): epoch of the earliest changed row. Only periods from
+                     the one containing "since" are recomputed (default:
+                     everything).
+    """
+    create_tables(conn)
+    parameters = get_parameters(conn)
+    if not parameters:
+        return
+    starts = {
+        p: None if since is None else int(get_bucket_starts([since], p)[0])
+        for p in parameters
+    }
+    first = min((s for s in starts.values() if s is not None), default=None)
+    columns = ', '.join(parameters)
+    if first is None:
+        df = pd.read_sql(
+            f'select epoch, {columns} from weather where epoch is not null '
+            'order by epoch', conn
+        )
+    else:
+        df = pd.read_sql(
+            f"""select epoch, {columns} from weather where epoch >= (
+                select coalesce(max(epoch), ?) from weather where epoch < ?
+            ) order by epoch""",
+            conn, params=(first, first)
+        )
+    epoch = df['epoch'].to_numpy()
+    for parameter in parameters:
+        values = df[parameter].to_numpy(dtype=np.float64)
+        totals = get_totals(epoch, values, parameter)
+        if starts[parameter] is None:
+            conn.execute('DELETE FROM rain_totals WHERE parameter = ?', (parameter,))
+        else:
+            totals = totals[totals.index >= starts[parameter]]
+            conn.execute(
+                'DELETE FROM rain_totals WHERE parameter = ? AND bucket >= ?',
+                (parameter, starts[parameter])
+            )
+        _store(conn, parameter, totals, accumulate=False)
+        _store_state(conn, parameter, epoch, values)
+
+
+def update(conn, df):
+    """Add new weather rows (with "epoch") to the stored totals.
+
+    Rows older than the last stored counter value trigger a recompute of
+    the affected periods. Runs in the transaction of the caller.
+    """
+    parameters = [p for p in get_parameters(conn) if p in df]
+    if df.empty or not parameters:
+        return
+    df = df.sort_values('epoch')
+    epoch = df['epoch'].to_numpy()
+    state = {
+        row[0]: row[1:] for row in conn.execute('select * from rain_state')
+    }
+    if any(epoch[0] <= state.get(p, (-np.inf,))[0] for p in parameters):
+        backfill(conn, since=int(epoch[0]))
+        return
+    for parameter in parameters:
+        values = pd.to_numeric(df[parameter], errors='coerce').to_numpy(dtype=np.float64)
+        previous = state.get(parameter, (None, np.nan))[1]
+        totals = get_totals(epoch, values, parameter, previous=previous)
+        _store(conn, parameter, totals, accumulate=True)
+        _store_state(conn, parameter, epoch, values)
+
+
+def read(conn, parameter, start, end):
+    """Return stored totals of the periods between start and end epochs."""
+    bucket = int(get_bucket_starts([start], parameter)[0])
+    return pd.read_sql(
+        f"""select datetime(bucket, 'unixepoch') as timestamp, total as {parameter}
+        from rain_totals where parameter = ? and bucket between ? and ?
+        order by bucket""",
+        conn,
+        params=(parameter, bucket, end),
+        parse_dates={'timestamp': schema.TIMESTAMP_FORMAT},
+    )
+
+
+if __name__ == '__main__':
+    from .handler import DataBaseHandler
+    conn = DataBaseHandler().get_conn()
+    backfill(conn)
+    conn.commit()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Response compression (gzip, or brotli when installed) and ETags derived
+from the data version, for the Flask server of the app.
+"""
+import gzip
+import zlib
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Responses smaller than this (bytes) are sent as they are.
+MIN_SIZE = 1024
+
+COMPRESSIBLE = (
+    'application/json',
+    'application/javascript',
+    'text/',
+)
+
+
+def get_etag(*parts):
+    """Return a strong ETag of the given parts (eg. data version, args)."""
+    digest = hashlib.sha1('\x1f'.join(str(p) for p in parts).encode())
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def matches(request, etag):
+    """Return True if the request already holds the response of etag."""
+    header = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+def get_accepted(accept_encoding):
+    """Return the encodings of an Accept-Encoding header (q=0 excluded)."""
+    return {
+        item.split(';')[0].strip()
+        for item in (accept_encoding or '').split(',')
+        if 'q=0' != item.replace(' ', '').split(';')[-1]
+    }
+
+
+def get_encoding(accept_encoding):
+    """Return the preferred supported encoding ("br", "gzip" or None)."""
+    accepted = get_accepted(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+
+
+def stream_gzip(chunks):
+    """Yield gzip compressed pieces of a streamed (text) body."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress(response, accept_encoding, min_size=MIN_SIZE):
+    """Compress a Flask response in place if worthwhile, return it."""
+    if (response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+        return response
+    encoding = get_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        # Unknown size, compressed on the fly.
+        if 'gzip' not in get_accepted(accept_encoding):
+            return response
+        response.response = stream_gzip(response.response)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers.pop('Content-Length', None)
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    if encoding == 'br':
+        data = brotli.compress(data, quality=5)
+    else:
+        data = gzip.compress(data, compresslevel=6)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Hourly and daily min/mean/max/count rollups of the weather table.
+
+Rebuild the rollups from the full history with:
+    python -m data_handler.rollup
+"""
+import pandas as pd
+
+from . import schema
+
+
+RESOLUTIONS = {
+    'hourly': 3600,
+    'daily': 86400,
+}
+
+# Typical time (seconds) between raw observations.
+OBSERVATION_INTERVAL = 60
+
+# Max number of rows we want to read for one time window. A week of
+# minute data (10,080 rows) is read raw and downsampled to the point
+# budget of the chart, a month or longer is read from the hourly rollup.
+MAX_ROWS = 20000
+
+TIME_COLUMNS = {'timestamp', 'year', 'month', 'day', 'hour', 'epoch'}
+
+# Parameters that can not be aggregated in a meaningful way.
+RAW_ONLY = {'windir'}
+
+# Statistic served for a rolled up parameter (default "mean").
+STATISTICS = dict(
+    gust='max',
+    rainh='max',
+    raind='max',
+    rainw='max',
+    rainm='max',
+    raint='max',
+)
+
+
+def get_table(resolution):
+    """Return table name of the resolution."""
+    return f'weather_{resolution}'
+
+
+def get_fields(conn):
+    """Return the aggregated fields (numeric columns of weather)."""
+    return [
+        column for column in schema.get_columns(conn, 'weather')
+        if column not in TIME_COLUMNS
+    ]
+
+
+def get_resolution(parameters, nr_days):
+    """Return the coarsest resolution needed to stay within MAX_ROWS.
+
+    "raw" is returned as long as the raw observations fit.
+    """
+    if RAW_ONLY.intersection(parameters):
+        return 'raw'
+    if nr_days * 86400 / OBSERVATION_INTERVAL <= MAX_ROWS:
+        return 'raw'
+    for resolution, size in RESOLUTIONS.items():
+        if nr_days * 86400 / size <= MAX_ROWS:
+            return resolution
+    return resolution
+
+
+def create_tables(conn, fields):
+    """Create rollup tables. Return True if they did not exist before."""
+    created = False
+    columns = ', '.join(
+        f'{f}_min REAL, {f}_max REAL, {f}_sum REAL, {f}_count INTEGER'
+        for f in fields
+    )
+    for resolution in RESOLUTIONS:
+        table = get_table(resolution)
+        if not schema.table_exists(conn, table):
+            conn.execute(
+                f'CREATE TABLE {table} (epoch INTEGER PRIMARY KEY, {columns})'
+            )
+            created = True
+    return created
+
+
+def backfill(conn, fields=None):
+    """Rebuild all rollups from the weather table.
+
+    Runs in the transaction of the caller.
+    """
+    fields = fields or get_fields(conn)
+    create_tables(conn, fields)
+    for resolution, size in RESOLUTIONS.items():
+        table = get_table(resolution)
+        targets = ', '.join(
+            f'{f}_min, {f}_max, {f}_sum, {f}_count' for f in fields
+        )
+        aggregates = ', '.join(
+            f'min({f}), max({f}), sum({f}), count({f})' for f in fields
+        )
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(
+            f"""INSERT INTO {table} (epoch, {targets})
+            SELECT (epoch / {size}) * {size}, {aggregates}
+            FROM weather WHERE epoch IS NOT NULL GROUP BY 1"""
+        )
+
+
+def update(conn, df, fields=None):
+    """Merge new weather rows (with "epoch") into the rollups.
+
+    Runs in the transaction of the caller, which is responsible for the
+    commit.
+    """
+    fields = fields or get_fields(conn)
+    if df.empty or not fields:
+        return
+    values = df.reindex(columns=fields).apply(pd.to_numeric, errors='coerce')
+    targets = ['epoch']
+    for f in fields:
+        targets += [f'{f}_min', f'{f}_max', f'{f}_sum', f'{f}_count']
+    assignments = ', '.join(
+        f"""{f}_min = min(coalesce({f}_min, excluded.{f}_min),
+                          coalesce(excluded.{f}_min, {f}_min)),
+        {f}_max = max(coalesce({f}_max, excluded.{f}_max),
+                      coalesce(excluded.{f}_max, {f}_max)),
+        {f}_sum = CASE WHEN excluded.{f}_sum IS NULL THEN {f}_sum
+                  ELSE coalesce({f}_sum, 0) + excluded.{f}_sum END,
+        {f}_count = coalesce({f}_count, 0) + excluded.{f}_count"""
+        for f in fields
+    )
+    for resolution, size in RESOLUTIONS.items():
+        grouped = values.groupby(df['epoch'].to_numpy() // size * size)
+        agg = pd.concat(
+            [grouped.min(), grouped.max(), grouped.sum(min_count=1), grouped.count()],
+            axis=1, keys=('min', 'max', 'sum', 'count')
+        ).swaplevel(axis=1)
+        agg = agg[[(f, s) for f in fields for s in ('min', 'max', 'sum', 'count')]]
+        rows = [
+            (int(epoch), *(None if pd.isnull(v) else float(v) for v in row))
+            for epoch, row in zip(agg.index, agg.to_numpy())
+        ]
+        conn.executemany(
+            f"""INSERT INTO {get_table(resolution)} ({', '.join(targets)})
+            VALUES ({', '.join('?' * len(targets))})
+            ON CONFLICT(epoch) DO UPDATE SET {assignments}""",
+            rows
+        )
+
+
+def get_statement(columns, resolution):
+    """Return select statement of rolled up columns between two epochs.
+
+    "timestamp" is the start of each bucket and every other column the
+    statistic in STATISTICS (default mean) of its bucket.
+    """
+    selection = []
+    for column in columns:
+        if column == 'timestamp':
+            selection.append(
+                "strftime('%Y-%m-%d %H:%M:%S', epoch, 'unixepoch') as timestamp"
+            )
+        elif column == 'epoch':
+            selection.append('epoch')
+        elif STATISTICS.get(column, 'mean') == 'mean':
+            selection.append(
+                f'{column}_sum / nullif({column}_count, 0) as {column}'
+            )
+        else:
+            selection.append(f'{column}_{STATISTICS[column]} as {column}')
+    return (
+        f"select {', '.join(selection)} from {get_table(resolution)} "
+        'where epoch between ? and ? order by epoch'
+    )
+
+
+def read(conn, columns, start, end, resolution):
+    """Return rolled up columns between start and end epochs.
+
+    Columns are expected to be validated by the caller, see
+    query.validate_columns.
+    """
+    size = RESOLUTIONS[resolution]
+    return pd.read_sql(
+        get_statement(columns, resolution),
+        conn,
+        params=(start - start % size, end),
+        parse_dates={'timestamp': schema.TIMESTAMP_FORMAT} if 'timestamp' in columns else None,
+    )
+
+
+if __name__ == '__main__':
+    from .handler import DataBaseHandler
+    conn = DataBaseHandler().get_conn()
+    backfill(conn)
+    conn.commit()
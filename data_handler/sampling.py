@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Downsampling of time series to a fixed point budget before plotting."""
+import numpy as np
+import pandas as pd
+
+
+def get_bucket_starts(n, nr_buckets):
+    """Return start index of nr_buckets equally sized buckets over n points."""
+    return np.unique(np.linspace(0, n, nr_buckets + 1).astype(np.int64)[:-1])
+
+
+def lttb(x, y, threshold):
+    """Return indices selected by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Each bucket in between
+    keeps the point forming the largest triangle with the point kept in
+    the previous bucket and the mean of the next bucket.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    starts = get_bucket_starts(n - 2, threshold - 2) + 1
+    ends = np.append(starts[1:], n - 1)
+    counts = ends - starts
+    x_mean = np.add.reduceat(x[1:-1], starts - 1) / counts
+    y_mean = np.add.reduceat(y[1:-1], starts - 1) / counts
+    x_mean = np.append(x_mean[1:], x[-1])
+    y_mean = np.append(y_mean[1:], y[-1])
+
+    selected = np.empty(len(starts) + 2, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        area = np.abs(
+            (x[previous] - x_mean[i]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (y_mean[i] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax(x, y, threshold):
+    """Return indices of the minimum and maximum in each bucket."""
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    starts = get_bucket_starts(n, max(threshold // 2, 1))
+    counts = np.diff(np.append(starts, n))
+    bucket = np.repeat(np.arange(len(starts)), counts)
+    selected = []
+    for reduce in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == np.repeat(reduce.reduceat(y, starts), counts))
+        # First hit in each bucket.
+        selected.append(hits[np.unique(bucket[hits], return_index=True)[1]])
+    return np.unique(np.concatenate(selected))
+
+
+def bucket_reduce(x, y, threshold, how='mean'):
+    """Return (x, y) aggregated into equally sized buckets.
+
+    x is taken from the first point of each bucket. "sum" keeps the
+    total of y unchanged, "mean" the average.
+    """
+    n = len(y)
+    if threshold >= n:
+        return x, y
+    starts = get_bucket_starts(n, threshold)
+    total = np.add.reduceat(y, starts)
+    if how == 'sum':
+        return x[starts], total
+    return x[starts], total / np.diff(np.append(starts, n))
+
+
+def downsample(df, column, method='lttb', threshold=2000, x_column='timestamp'):
+    """Return df reduced to at most "threshold" points of column.
+
+    Args:
+        df (pd.DataFrame): frame with x_column (datetime64) and column.
+        column (str): y column.
+        method (str): "lttb", "minmax", "mean" or "sum".
+        threshold (int): point budget.
+        x_column (str): x column.
+    """
+    if len(df) <= threshold:
+        return df
+    df = df.loc[~pd.isnull(df[column]), [x_column, column]]
+    if len(df) <= threshold:
+        return df.reset_index(drop=True)
+
+    x_values = df[x_column].to_numpy()
+    x = x_values.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    y = df[column].to_numpy(dtype=np.float64)
+    if method in ('mean', 'sum'):
+        index, y = bucket_reduce(np.arange(len(y)), y, threshold, how=method)
+        return pd.DataFrame({x_column: x_values[index], column: y})
+    elif method == 'minmax':
+        index = minmax(x, y, threshold)
+    else:
+        index = lttb(x, y, threshold)
+    return df.iloc[index].reset_index(drop=True)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Schema migrations for the weather database.
+
+The migration (backfills included) runs offline, against an existing
+database with:
+    python -m data_handler.schema
+or from the gunicorn on_starting hook (see gunicorn.conf.py). The request
+path only checks the schema, see is_migrated.
+"""
+from . import rollup, rainy, archive, windcube
+
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+EPOCH_INDEX = 'ix_weather_epoch'
+
+INTEGER_FIELDS = {'epoch', 'year', 'month', 'day', 'hour'}
+
+
+def table_exists(conn, table):
+    """Return True if table exists in the database."""
+    return conn.execute(
+        "select 1 from sqlite_master where type = 'table' and name = ?", (table,)
+    ).fetchone() is not None
+
+
+def get_columns(conn, table):
+    """Return the column names of table."""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def create_weather_table(conn, fields):
+    """Create table "weather" with the given fields (and "epoch")."""
+    columns = []
+    for field in [*fields, 'epoch']:
+        if field == 'timestamp':
+            columns.append('timestamp TEXT')
+        elif field in INTEGER_FIELDS:
+            columns.append(f'{field} INTEGER')
+        else:
+            columns.append(f'{field} REAL')
+    conn.execute(f'CREATE TABLE IF NOT EXISTS weather ({", ".join(columns)})')
+    conn.commit()
+
+
+def get_required_tables():
+    """Return names of the tables (and index) a migrated database has."""
+    return {
+        EPOCH_INDEX,
+        *(rollup.get_table(resolution) for resolution in rollup.RESOLUTIONS),
+        'rain_totals',
+        'rain_state',
+        'wind_histogram',
+        'archive_months',
+    }
+
+
+def is_migrated(conn):
+    """Return True if the weather database is on the current schema.
+
+    Only reads the schema, cheap enough for the request path.
+    """
+    if not table_exists(conn, 'weather') or 'epoch' not in get_columns(conn, 'weather'):
+        return False
+    names = {row[0] for row in conn.execute('select name from sqlite_master')}
+    return get_required_tables() <= names
+
+
+def migrate(conn):
+    """Add, backfill and index the integer "epoch" column of table "weather".
+
+    The epoch column holds the local wall-clock "timestamp" as seconds
+    since 1970-01-01 (no time zone shift), which makes every time window
+    an index range scan. Missing rollup, rain total and wind histogram
+    tables are created and backfilled, the list of archived months is
+    created.
+
+    Returns False if the weather table does not exist yet.
+    """
+    if not table_exists(conn, 'weather'):
+        return False
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if 'epoch' not in get_columns(conn, 'weather'):
+            conn.execute('ALTER TABLE weather ADD COLUMN epoch INTEGER')
+        conn.execute(
+            """UPDATE weather SET epoch = CAST(strftime('%s', timestamp) AS INTEGER)
+            WHERE epoch IS NULL AND timestamp IS NOT NULL"""
+        )
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS {EPOCH_INDEX} ON weather (epoch)'
+        )
+        if rainy.create_tables(conn):
+            rainy.backfill(conn)
+        if rollup.create_tables(conn, rollup.get_fields(conn)):
+            rollup.backfill(conn)
+        if windcube.create_tables(conn):
+            windcube.backfill(conn)
+        archive.create_tables(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+if __name__ == '__main__':
+    from .handler import get_db_conn
+    migrate(get_db_conn())
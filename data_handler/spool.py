@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Durable ingest queue in front of the weather database.
+
+Requests append their records to a local SQLite spool (path given by the
+environment variable INGESTQUEUE) and return at once. One writer thread,
+in whichever worker process holds the lock file, drains the spool into the
+weather table in batched transactions. Items are removed from the spool
+after they are written, so a crash in between only repeats them, and the
+weather table already skips rows with a stored timestamp.
+
+Records are checked (see ingest.get_frame) before they are spooled. An
+item that still fails to be written with bad data is moved to table
+"spool_dead" instead of blocking the items behind it.
+"""
+import os
+import json
+import time
+import fcntl
+import threading
+
+from .pool import ConnectionPool, PRAGMAS
+from .ingest import get_frame
+
+
+SPOOL_PRAGMAS = tuple(
+    (pragma, 'FULL' if pragma == 'synchronous' else value)
+    for pragma, value in PRAGMAS
+)
+
+# Number of batches kept for the latency metrics.
+LOG_SIZE = 100
+
+
+class IngestQueue:
+    """Spool of incoming records and its single writer.
+
+    Args:
+        env_key (str): environment variable with the spool path, the
+                       queue is disabled if it is not set.
+        batch_size (int): max number of spooled requests per transaction.
+        poll_interval (float): seconds between checks for new items put
+                               by other processes.
+    """
+
+    def __init__(self, env_key='INGESTQUEUE', batch_size=500, poll_interval=0.5):
+        self.env_key = env_key
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.pool = ConnectionPool(env_key, pragmas=SPOOL_PRAGMAS)
+        self._ready = False
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock_fd = None
+        self.last_error = None
+
+    @property
+    def enabled(self):
+        """Return True if a spool path is configured."""
+        return bool(os.getenv(self.env_key))
+
+    def _conn(self):
+        conn = self.pool.connect()
+        if not self._ready:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, received REAL,
+                nr_records INTEGER, body TEXT)"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS spool_log (
+                finished REAL, nr_items INTEGER, nr_records INTEGER,
+                nr_inserted INTEGER, write_seconds REAL, max_wait_seconds REAL)"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS spool_dead (
+                id INTEGER PRIMARY KEY, received REAL, nr_records INTEGER,
+                body TEXT, failed REAL, error TEXT)"""
+            )
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def put(self, records, db_fields):
+        """Append records (list of dicts, see ingest.get_frame) to the spool.
+
+        Raises ValueError, before anything is spooled, if get_frame can
+        not parse the records or none of them is valid.
+
+        Returns:
+            number of queued records.
+        """
+        df, _ = get_frame(records, db_fields)
+        if df.empty:
+            raise ValueError('No valid rows')
+        conn = self._conn()
+        conn.execute(
+            'INSERT INTO spool (received, nr_records, body) VALUES (?, ?, ?)',
+            (time.time(), len(records), json.dumps(records))
+        )
+        conn.commit()
+        self._wakeup.set()
+        return len(records)
+
+    def drain(self, handler):
+        """Write one batch of spooled items with handler.post_many.
+
+        Returns:
+            number of written spool items (0 if the spool is empty).
+        """
+        conn = self._conn()
+        items = conn.execute(
+            'select id, received, body from spool order by id limit ?',
+            (self.batch_size,)
+        ).fetchall()
+        if not items:
+            return 0
+        start = time.time()
+        try:
+            records = [record for _, _, body in items for record in json.loads(body)]
+            nr_records, nr_inserted = len(records), handler.post_many(records)['inserted']
+        except (ValueError, TypeError):
+            # Bad data in the batch, write item by item and set aside the bad.
+            nr_records, nr_inserted = self._drain_items(conn, handler, items)
+        finished = time.time()
+        conn.execute('DELETE FROM spool WHERE id <= ?', (items[-1][0],))
+        conn.execute(
+            'INSERT INTO spool_log VALUES (?, ?, ?, ?, ?, ?)',
+            (finished, len(items), nr_records, nr_inserted,
+             finished - start, finished - items[0][1])
+        )
+        conn.execute(
+            """DELETE FROM spool_log WHERE rowid NOT IN (
+                SELECT rowid FROM spool_log ORDER BY finished DESC LIMIT ?)""",
+            (LOG_SIZE,)
+        )
+        conn.commit()
+        return len(items)
+
+    def _drain_items(self, conn, handler, items):
+        """Write items one by one, move those with bad data to "spool_dead".
+
+        Returns:
+            (number of records, number of inserted rows) of the written items.
+        """
+        nr_records = nr_inserted = 0
+        for item_id, _, body in items:
+            try:
+                records = json.loads(body)
+                nr_inserted += handler.post_many(records)['inserted']
+                nr_records += len(records)
+            except (ValueError, TypeError) as error:
+                self.last_error = repr(error)
+                conn.execute(
+                    """INSERT OR REPLACE INTO spool_dead
+                    SELECT id, received, nr_records, body, ?, ? FROM spool WHERE id = ?""",
+                    (time.time(), repr(error), item_id)
+                )
+        return nr_records, nr_inserted
+
+    def acquire_writer_lock(self):
+        """Return True if this process holds (or now takes) the writer lock."""
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(f'{os.getenv(self.env_key)}.lock', os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release_writer_lock(self):
+        """Release the writer lock."""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _run(self, handler):
+        while not self._stop.is_set():
+            if not self.acquire_writer_lock():
+                self._stop.wait(self.poll_interval * 10)
+                continue
+            try:
+                written = self.drain(handler)
+            except Exception as error:
+                # Keep the items, retry after a pause (eg. database locked).
+                self.last_error = repr(error)
+                written = 0
+            if not written:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        self.release_writer_lock()
+
+    def start(self, handler):
+        """Start the writer thread of this process (if not running)."""
+        if self._pid != os.getpid():
+            # Forked child: neither the thread nor the lock are ours.
+            self._thread = None
+            self._lock_fd = None
+            self._pid = os.getpid()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(handler,), name='ingest-writer',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the writer thread."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Return queue depth and write latency of the recent batches."""
+        conn = self._conn()
+        depth, nr_records, oldest = conn.execute(
+            'select count(*), coalesce(sum(nr_records), 0), min(received) from spool'
+        ).fetchone()
+        batches, mean_write, max_write, mean_wait, max_wait = conn.execute(
+            """select count(*), avg(write_seconds), max(write_seconds),
+            avg(max_wait_seconds), max(max_wait_seconds) from spool_log"""
+        ).fetchone()
+        dead = conn.execute('select count(*) from spool_dead').fetchone()[0]
+        return {
+            'depth': depth,
+            'queued_records': nr_records,
+            'oldest_age_seconds': None if oldest is None else time.time() - oldest,
+            'recent_batches': batches,
+            'write_seconds_mean': mean_write,
+            'write_seconds_max': max_write,
+            'wait_seconds_mean': mean_wait,
+            'wait_seconds_max': max_wait,
+            'dead_items': dead,
+            'writer': self._lock_fd is not None,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON encoders for the time log, see
+DataBaseHandler.iter_time_log.
+"""
+import json
+
+
+def _join(items, first):
+    """Return items as a JSON list fragment."""
+    text = ', '.join(items)
+    return text if first else ', ' + text
+
+
+def stream_list(chunks):
+    """Yield {"time_log": [timestamp, ...]} piece by piece."""
+    yield '{"time_log": ['
+    first = True
+    for rows in chunks:
+        yield _join((json.dumps(timestamp) for timestamp, _ in rows), first)
+        first = False
+    yield ']}'
+
+
+def stream_deltas(chunks):
+    """Yield {"start": timestamp, "deltas": [seconds, ...]} piece by piece.
+
+    Each delta is the number of seconds since the previous timestamp.
+    """
+    first = True
+    previous = None
+    for rows in chunks:
+        if previous is None:
+            yield f'{{"start": {json.dumps(rows[0][0])}, "deltas": ['
+            previous = rows[0][1]
+            rows = rows[1:]
+        deltas = []
+        for _, epoch in rows:
+            deltas.append(str(epoch - previous))
+            previous = epoch
+        if deltas:
+            yield _join(deltas, first)
+            first = False
+    if previous is None:
+        yield '{"start": null, "deltas": ['
+    yield ']}'
+
+
+def stream_gaps(chunks, interval):
+    """Yield {"gaps": [[last before, first after], ...]} piece by piece.
+
+    A gap is any step between two stored timestamps longer than 1.5
+    times the expected interval (seconds).
+    """
+    yield f'{{"interval": {int(interval)}, "gaps": ['
+    first = True
+    previous = None
+    for rows in chunks:
+        gaps = []
+        for timestamp, epoch in rows:
+            if previous is not None and epoch - previous[1] > 1.5 * interval:
+                gaps.append(json.dumps([previous[0], timestamp]))
+            previous = (timestamp, epoch)
+        if gaps:
+            yield _join(gaps, first)
+            first = False
+    yield ']}'
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Daily wind histograms: number of observations per day, direction (see
+windy.get_direction_codes) and 1 m/s speed bin (see windy.get_speed_floors)
+for the mean wind ("winsp") and the gusts ("gust").
+
+Histograms add up, so the wind rose of any period is the sum of the days
+within it, plus the binned raw observations of the partial first and last
+day.
+
+Rebuild the histograms from the full history with:
+    python -m data_handler.windcube
+"""
+import numpy as np
+import pandas as pd
+
+from . import schema, windy
+
+
+SPEED_PARAMETERS = ('winsp', 'gust')
+
+DAY = 86400
+
+
+def create_tables(conn):
+    """Create table "wind_histogram". Return True if it did not exist before."""
+    exists = schema.table_exists(conn, 'wind_histogram')
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS wind_histogram (
+        parameter TEXT, day INTEGER, direction INTEGER, floor INTEGER,
+        count INTEGER, PRIMARY KEY (parameter, day, direction, floor)
+        ) WITHOUT ROWID"""
+    )
+    return not exists
+
+
+def get_parameters(conn):
+    """Return speed parameters available in the weather table."""
+    columns = schema.get_columns(conn, 'weather')
+    if 'windir' not in columns:
+        return []
+    return [p for p in SPEED_PARAMETERS if p in columns]
+
+
+def get_bins(speed, windir):
+    """Return (direction codes, speed floors) of valid observations.
+
+    Observations without direction or without a positive speed are left
+    out, the same as for the raw wind rose.
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    windir = np.asarray(windir, dtype=np.float64)
+    valid = ~np.isnan(speed) & ~np.isnan(windir) & (speed > 0.)
+    return (
+        valid,
+        windy.get_direction_codes(windir[valid]),
+        windy.get_speed_floors(speed[valid]),
+    )
+
+
+def get_histogram(epoch, speed, windir):
+    """Return counts per day, direction and speed floor as a dataframe."""
+    valid, directions, floors = get_bins(speed, windir)
+    days = np.asarray(epoch, dtype=np.int64)[valid] // DAY * DAY
+    df = pd.DataFrame({'day': days, 'direction': directions, 'floor': floors})
+    return df.groupby(['day', 'direction', 'floor']).size().rename('count').reset_index()
+
+
+def _store(conn, parameter, df):
+    """Add counts to the stored histograms."""
+    conn.executemany(
+        """INSERT INTO wind_histogram VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(parameter, day, direction, floor) DO UPDATE
+        SET count = count + excluded.count""",
+        [(parameter, *map(int, row)) for row in df.to_numpy()]
+    )
+
+
+def backfill(conn):
+    """Recompute all histograms from the weather table.
+
+    Runs in the transaction of the caller.
+    """
+    create_tables(conn)
+    conn.execute('DELETE FROM wind_histogram')
+    parameters = get_parameters(conn)
+    if not parameters:
+        return
+    df = pd.read_sql(
+        f"select epoch, windir, {', '.join(parameters)} from weather "
+        'where epoch is not null', conn
+    )
+    for parameter in parameters:
+        _store(conn, parameter, get_histogram(df['epoch'], df[parameter], df['windir']))
+
+
+def update(conn, df):
+    """Add new weather rows (with "epoch") to the histograms.
+
+    Rows must not be stored already (see DataBaseHandler.insert_frame).
+    Runs in the transaction of the caller.
+    """
+    if df.empty or 'windir' not in df:
+        return
+    windir = pd.to_numeric(df['windir'], errors='coerce')
+    for parameter in get_parameters(conn):
+        if parameter in df:
+            _store(conn, parameter, get_histogram(
+                df['epoch'], pd.to_numeric(df[parameter], errors='coerce'), windir
+            ))
+
+
+def read(conn, parameter, start, end):
+    """Return (direction codes, speed floors, counts) between start and end.
+
+    Whole days come from the stored histograms, the partial first and last
+    day from the raw observations.
+    """
+    if parameter not in SPEED_PARAMETERS:
+        raise ValueError(f'Not a wind speed: {parameter}')
+    first = -(-start // DAY) * DAY
+    last = (end + 1) // DAY * DAY
+    parts = []
+    if first < last:
+        parts.append(pd.read_sql(
+            """select direction, floor, sum(count) as count from wind_histogram
+            where parameter = ? and day >= ? and day < ? group by 1, 2""",
+            conn, params=(parameter, first, last),
+        ))
+        edges = ((start, first - 1), (last, end))
+    else:
+        edges = ((start, end),)
+    for lower, upper in edges:
+        if lower > upper:
+            continue
+        raw = conn.execute(
+            f'select {parameter}, windir from weather where epoch between ? and ?',
+            (lower, upper)
+        ).fetchall()
+        if raw:
+            speed, windir = np.array(raw, dtype=np.float64).T
+            _, directions, floors = get_bins(speed, windir)
+            parts.append(pd.DataFrame({
+                'direction': directions, 'floor': floors, 'count': 1
+            }))
+    if not parts:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([])
+    df = pd.concat(parts).groupby(['direction', 'floor'])['count'].sum().reset_index()
+    return df['direction'].to_numpy(), df['floor'].to_numpy(), df['count'].to_numpy()
+
+
+if __name__ == '__main__':
+    from .handler import DataBaseHandler
+    conn = DataBaseHandler().get_conn()
+    backfill(conn)
+    conn.commit()
@@ -15,6 +15,7 @@ wind_directions = (
 windir_mapper = tuple(
     (d, (i * 22.5) + 11.25) for i, d in enumerate(wind_directions)
 )
+WINDIR_BOUNDS = np.array([upper_bounds for _, upper_bounds in windir_mapper])
 
 
 def get_direction(x):
@@ -36,21 +37,88 @@ def get_speed_range(x):
         return f'{int(np.floor(x))}-{int(np.ceil(x))}'
 
 
+def get_direction_codes(windir):
+    """Return index in wind_directions for each value, -1 for NaN.
+
+    Vectorised equivalent of get_direction.
+    """
+    windir = np.asarray(windir, dtype=np.float64)
+    codes = np.searchsorted(WINDIR_BOUNDS, windir, side='right')
+    codes[codes == len(wind_directions)] = 0
+    codes[np.isnan(windir)] = -1
+    return codes
+
+
+def get_speed_floors(winsp):
+    """Return lower bound (int) of the 1 m/s speed range of each value.
+
+    Vectorised equivalent of get_speed_range.
+    """
+    return np.floor(np.asarray(winsp, dtype=np.float64)).astype(np.int64)
+
+
+def get_frequency_frame(direction_codes, strength_labels, strength_codes,
+                        weights=None):
+    """Return the wind rose frequency table of binned observations.
+
+    Strengths are ordered by label and directions by wind_directions,
+    frequencies are given in percent of all observations.
+
+    Args:
+        weights (array): number of observations of each row (default 1).
+    """
+    nr_obs = float(len(direction_codes) if weights is None else np.sum(weights))
+    nr_dir = len(wind_directions)
+    order = np.argsort(strength_labels, kind='stable')
+    valid = direction_codes >= 0
+    counts = np.bincount(
+        strength_codes[valid] * nr_dir + direction_codes[valid],
+        weights=None if weights is None else np.asarray(weights)[valid],
+        minlength=len(strength_labels) * nr_dir
+    ).reshape(len(strength_labels), nr_dir)[order]
+    return pd.DataFrame({
+        'direction': list(wind_directions) * len(order),
+        'strength': np.repeat(np.asarray(strength_labels, dtype=object)[order], nr_dir),
+        'frequency': (counts / nr_obs * 100).ravel() if nr_obs else [],
+    })
+
+
+def get_wind_rose(winsp, windir):
+    """Return the wind rose frequency table of raw speeds and directions."""
+    floors, strength_codes = np.unique(get_speed_floors(winsp), return_inverse=True)
+    labels = [f'{f}-{f + 1}' for f in floors]
+    return get_frequency_frame(
+        get_direction_codes(windir), labels, strength_codes.ravel()
+    )
+
+
+def get_wind_rose_from_counts(direction_codes, speed_floors, counts):
+    """Return the wind rose frequency table of binned counts.
+
+    Args:
+        direction_codes (array): see get_direction_codes.
+        speed_floors (array): see get_speed_floors.
+        counts (array): number of observations in each bin.
+    """
+    floors, strength_codes = np.unique(
+        np.asarray(speed_floors, dtype=np.int64), return_inverse=True
+    )
+    labels = [f'{f}-{f + 1}' for f in floors]
+    return get_frequency_frame(
+        np.asarray(direction_codes, dtype=np.int64), labels,
+        strength_codes.ravel(), weights=counts,
+    )
+
+
 def get_windframe(df):
-    """Doc."""
-    combos = df[['direction', 'strength']].apply(tuple, axis=1)
-    unique_combos = sorted(combos.unique())
-    data = {c: [] for c in ('direction', 'strength', 'frequency')}
-    nr_obs = float(len(combos))
-    for strength in sorted(df['strength'].unique()):
-        for windir in wind_directions:
-            tup = (windir, strength)
-            data['direction'].append(windir)
-            data['strength'].append(strength)
-            if tup in unique_combos:
-                boolean = combos == tup
-                data['frequency'].append(boolean.sum() / nr_obs * 100)
-            else:
-                data['frequency'].append(0)
-
-    return pd.DataFrame(data)
+    """Return the wind rose frequency table of labelled observations.
+
+    Args:
+        df (pd.DataFrame): "direction" (see get_direction) and "strength"
+                           (see get_speed_range) for each observation.
+    """
+    direction_codes = pd.Categorical(
+        df['direction'], categories=wind_directions
+    ).codes.astype(np.int64)
+    strength_codes, labels = pd.factorize(df['strength'])
+    return get_frequency_frame(direction_codes, list(labels), strength_codes)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Gunicorn settings (see Procfile).
+
+The app is imported once in the master (preload_app), so the handlers and
+the static layout are built before fork and shared copy-on-write by the
+workers. Connection pools and the ingest writer are per process and are
+reopened by each worker on first use. The database is migrated in the
+master at start, the workers only check the schema.
+"""
+import os
+import gc
+
+workers = 4
+preload_app = True
+
+
+def on_starting(server):
+    """Migrate the weather database once, before any worker serves it."""
+    if os.getenv('TSTWEATHERDB'):
+        from data_handler.handler import DataBaseHandler
+        DataBaseHandler().migrate()
+
+
+def pre_fork(server, worker):
+    """Close master connections, move the app objects out of the collector."""
+    from data_handler.handler import DB_POOL, FORECAST_POOL
+    DB_POOL.close_all()
+    FORECAST_POOL.close_all()
+    # Objects that survive until here are never collected, so the garbage
+    # collector does not touch (and copy) their pages in the workers.
+    gc.freeze()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Synthetic weather data for the tests and benchmarks."""
+import sqlite3
+import numpy as np
+import pandas as pd
+
+
+def get_weather_frame(days, freq_seconds=60, end=None, seed=1):
+    """Return a synthetic weather dataframe with the db_fields columns.
+
+    Args:
+        days (int): length of the record, ending at "end" (default: now).
+        freq_seconds (int): time between observations.
+        end (str): last timestamp (local wall-clock).
+        seed (int): random seed.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.today(tz='Europe/Stockholm')).tz_localize(None)
+    n = int(days * 86400 / freq_seconds)
+    time = pd.date_range(end=end.floor('s'), periods=n, freq=f'{freq_seconds}s')
+
+    hours = time.hour.to_numpy() + time.minute.to_numpy() / 60.
+    doy = time.dayofyear.to_numpy()
+    outtemp = (
+        8 - 10 * np.cos(2 * np.pi * doy / 365.)
+        - 4 * np.cos(2 * np.pi * hours / 24.)
+        + np.cumsum(rng.normal(0, 0.02, n))
+    ).round(2)
+    winsp = np.abs(rng.gamma(2., 1.2, n)).round(1)
+    rain = np.where(rng.random(n) < 0.01, rng.gamma(1., 0.3, n), 0.).round(1)
+
+    df = pd.DataFrame({
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'year': time.year,
+        'month': time.month,
+        'day': time.day,
+        'hour': time.hour,
+        'intemp': (21 + rng.normal(0, 0.5, n)).round(2),
+        'outtemp': outtemp,
+        'outhumi': np.clip(75 + rng.normal(0, 10, n), 10, 100).round(0),
+        'outdew': (outtemp - 5).round(2),
+        'outfeel': (outtemp - winsp / 2).round(2),
+        'winsp': winsp,
+        'gust': (winsp * rng.uniform(1., 1.8, n)).round(1),
+        'windir': rng.uniform(0, 360, n).round(0),
+        'presabs': (1005 + 10 * np.sin(np.arange(n) / 5000.)).round(1),
+        'presrel': (1012 + 10 * np.sin(np.arange(n) / 5000.)).round(1),
+    })
+    for parameter, key in (('rainh', time.floor('h')),
+                           ('raind', time.floor('D')),
+                           ('rainw', time.to_period('W').start_time),
+                           ('rainm', time.to_period('M').start_time)):
+        df[parameter] = pd.Series(rain).groupby(np.asarray(key)).cumsum().round(1)
+    df['raint'] = np.cumsum(rain).round(1)
+    return df
+
+
+def make_weather_db(path, days, freq_seconds=60, end=None, index=True):
+    """Write a synthetic weather table to the SQLite database at path."""
+    df = get_weather_frame(days, freq_seconds=freq_seconds, end=end)
+    df['epoch'] = (
+        pd.to_datetime(df['timestamp']) - pd.Timestamp(0)
+    ) // pd.Timedelta(seconds=1)
+    conn = sqlite3.connect(path)
+    df.to_sql('weather', conn, if_exists='replace', index=False, chunksize=50000)
+    if index:
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_weather_epoch ON weather (epoch)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def get_forecast_payload(nr_steps, reference_time='2022-01-30T10:00:00Z', seed=1):
+    """Return a synthetic SMHI PMP3g point forecast (parsed json).
+
+    Args:
+        nr_steps (int): number of hourly time steps.
+        reference_time (str): model run time (UTC, ISO format).
+        seed (int): random seed.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(reference_time).ceil('h')
+    times = pd.date_range(start, periods=nr_steps, freq='h')
+    units = dict(t='Cel', r='percent', ws='m/s', gust='m/s', wd='degree',
+                 msl='hPa', pmean='kg/m2/h', pmin='kg/m2/h', pmax='kg/m2/h',
+                 tcc_mean='octas', vis='km')
+    values = {name: rng.uniform(0, 20, nr_steps).round(1) for name in units}
+    return {
+        'approvedTime': reference_time,
+        'referenceTime': reference_time,
+        'geometry': {'type': 'Point', 'coordinates': [[12.29, 57.38]]},
+        'timeSeries': [
+            {
+                'validTime': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'parameters': [
+                    {'name': name, 'levelType': 'hl', 'level': 2,
+                     'unit': unit, 'values': [float(values[name][i])]}
+                    for name, unit in units.items()
+                ],
+            }
+            for i, time in enumerate(times)
+        ],
+    }
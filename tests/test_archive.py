@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.archive."""
+import pandas as pd
+
+from data_handler import archive
+from data_handler.handler import DataBaseHandler, to_epoch
+from synthetic import make_weather_db
+
+
+def test_archive_read_matches_sqlite(tmp_path, monkeypatch):
+    db_path = tmp_path.joinpath('weather.db')
+    monkeypatch.setenv('TSTWEATHERDB', str(db_path))
+    # Keep observations off the (moving) start of the period.
+    end = pd.Timestamp.now(tz='Europe/Stockholm') - pd.Timedelta(minutes=30)
+    make_weather_db(db_path, days=70, freq_seconds=3600, end=end)
+    handler = DataBaseHandler()
+    handler.migrate()
+    conn = handler.get_conn()
+    columns = ('timestamp', 'outtemp', 'windir')
+    expected = handler.get_parameter_data_for_time_period(
+        *columns, time_period='month', resolution='raw'
+    )
+
+    months = archive.compact(conn, tmp_path.joinpath('archive'))
+    assert len(months) >= 2
+    monkeypatch.setenv('WEATHERARCHIVE', str(tmp_path.joinpath('archive')))
+    handler = DataBaseHandler()
+    start = to_epoch(expected['timestamp'].iloc[0])
+    assert archive.get_archived_months(handler.get_conn(), start, start)
+    df = handler.get_parameter_data_for_time_period(
+        *columns, time_period='month', resolution='raw'
+    )
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_raw_only_parameter_reads_archive(tmp_path, monkeypatch):
+    db_path = tmp_path.joinpath('weather.db')
+    monkeypatch.setenv('TSTWEATHERDB', str(db_path))
+    end = pd.Timestamp.now(tz='Europe/Stockholm') - pd.Timedelta(minutes=30)
+    make_weather_db(db_path, days=70, freq_seconds=3600, end=end)
+    handler = DataBaseHandler()
+    handler.migrate()
+    expected = handler.get_parameter_data_for_time_period(
+        'timestamp', 'windir', time_period='halfyear'
+    )
+    archive.compact(handler.get_conn(), tmp_path.joinpath('archive'))
+    monkeypatch.setenv('WEATHERARCHIVE', str(tmp_path.joinpath('archive')))
+
+    reads = []
+    read_months = archive.read_months
+    monkeypatch.setattr(archive, 'read_months',
+                        lambda *args: reads.append(args) or read_months(*args))
+    handler = DataBaseHandler()
+    df = handler.get_parameter_data_for_time_period(
+        'timestamp', 'windir', time_period='halfyear'
+    )
+    assert len(reads) == 1
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    # Rolled up parameters are served by the hourly rollup instead.
+    handler.get_parameter_data_for_time_period(
+        'timestamp', 'outtemp', time_period='halfyear'
+    )
+    assert len(reads) == 1
+
+
+def test_late_insert_invalidates_month(tmp_path, monkeypatch):
+    db_path = tmp_path.joinpath('weather.db')
+    monkeypatch.setenv('TSTWEATHERDB', str(db_path))
+    monkeypatch.setenv('WEATHERARCHIVE', str(tmp_path.joinpath('archive')))
+    handler = DataBaseHandler()
+    handler.post(timestamp=['2022-01-10 12:00:00', '2022-02-10 12:00:00'],
+                 outtemp=[1.0, 2.0])
+    conn = handler.get_conn()
+    assert archive.compact(conn, handler.archive_dir) == ['2022-01', '2022-02']
+    handler.post(timestamp=['2022-02-11 12:00:00'], outtemp=[3.0])
+    start = to_epoch('2022-01-01')
+    assert archive.get_archived_months(conn, start, start + 10 ** 8) == [
+        ('2022-01', to_epoch('2022-02-01'))
+    ]
+    assert archive.compact(conn, handler.archive_dir) == ['2022-02']
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.cache."""
+import pytest
+
+from data_handler.cache import FigureCache, DataVersion
+
+
+@pytest.mark.parametrize('use_file', [False, True])
+def test_lru_eviction_by_bytes(tmp_path, monkeypatch, use_file):
+    if use_file:
+        monkeypatch.setenv('FIGURECACHE', str(tmp_path.joinpath('cache.db')))
+    else:
+        monkeypatch.delenv('FIGURECACHE', raising=False)
+    cache = FigureCache(max_bytes=250)
+    for key in 'abc':
+        cache.set(key, b'x' * 100)
+    assert cache.get('a') is None
+    assert cache.get('b') == b'x' * 100
+    cache.set('d', b'y' * 100)
+    assert cache.get('c') is None
+    assert cache.get('b') is not None
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'items': 2, 'bytes': 200}
+
+
+def test_max_age(monkeypatch):
+    monkeypatch.delenv('FIGURECACHE', raising=False)
+    cache = FigureCache(max_age=-1)
+    cache.set('a', b'x')
+    assert cache.get('a') is None
+
+
+def test_data_version(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATAVERSION', str(tmp_path.joinpath('version')))
+    version = DataVersion()
+    assert version.get() == '0'
+    token = version.bump()
+    assert version.get() == token
+    assert version.bump() != token
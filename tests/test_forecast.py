@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.forecast."""
+import json
+import sqlite3
+import threading
+import http.server
+import functools
+import pandas as pd
+
+from data_handler import forecast
+from data_handler.handler import ForecastHandler
+from synthetic import get_forecast_payload
+
+
+def test_frame_is_local_time_and_mapped():
+    df = forecast.get_frame(get_forecast_payload(3))
+    assert list(df.columns) == forecast.COLUMNS
+    # 10:00 UTC is 11:00 in Stockholm (winter time).
+    assert df.index[0] == '2022-01-30 11:00:00'
+
+
+def test_ingest_only_changed_rows(tmp_path):
+    conn = sqlite3.connect(tmp_path.joinpath('forecast.db'))
+    first = get_forecast_payload(48)
+    assert forecast.ingest(first, conn=conn)['changed'] == 48
+    assert forecast.ingest(first, conn=conn)['skipped']
+
+    second = get_forecast_payload(48, reference_time='2022-01-30T11:00:00Z')
+    # Same valid times from hour 2 on, with one changed value.
+    second['timeSeries'] = first['timeSeries'][1:] + second['timeSeries'][-1:]
+    second['timeSeries'][5]['parameters'][0]['values'] = [-30.0]
+    result = forecast.ingest(second, conn=conn)
+    assert result == {'issue_time': '2022-01-30T11:00:00Z', 'received': 48,
+                      'changed': 2, 'skipped': False}
+    assert forecast.get_latest_issue_time(conn) == '2022-01-30T11:00:00Z'
+    assert conn.execute('select count(*) from forecast').fetchone()[0] == 49
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def test_load_from_http(tmp_path):
+    tmp_path.joinpath('data.json').write_text(json.dumps(get_forecast_payload(2)))
+    handler = functools.partial(QuietHandler, directory=str(tmp_path))
+    server = http.server.HTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        data = forecast.load(f'http://127.0.0.1:{server.server_port}/data.json')
+    finally:
+        server.shutdown()
+    assert len(data['timeSeries']) == 2
+
+
+def test_forecast_handler_store(tmp_path, monkeypatch):
+    monkeypatch.setenv('FORECASTDB', str(tmp_path.joinpath('forecast.db')))
+    handler = ForecastHandler()
+    now = handler.today.tz_convert('UTC').floor('h')
+    payload = get_forecast_payload(
+        80, reference_time=now.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    forecast.ingest(payload)
+
+    day = handler.get_parameter_data_for_time_period(
+        'timestamp', 'outtemp', time_period='day')
+    days3 = handler.get_parameter_data_for_time_period(
+        'timestamp', 'rainh', 'rainhmin', time_period='days3')
+    assert 23 <= len(day) <= 25
+    assert 71 <= len(days3) <= 73
+    assert list(days3.columns) == ['timestamp', 'rainh', 'rainhmin']
+    store = handler.get_store()
+    assert handler.get_store() is store
+
+    payload['referenceTime'] = (now + pd.Timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    payload['timeSeries'][0]['parameters'][0]['values'] = [-30.]
+    forecast.ingest(payload)
+    assert handler.get_store() is not store
+    assert handler.get_parameter_data_for_time_period(
+        'outtemp', time_period='day')['outtemp'].min() == -30.
+
+
+def test_store_reloads_external_forecast(tmp_path, monkeypatch):
+    path = tmp_path.joinpath('forecast.db')
+    monkeypatch.setenv('FORECASTDB', str(path))
+    handler = ForecastHandler()
+    now = handler.today.floor('h').tz_localize(None)
+    external = sqlite3.connect(path)
+
+    def write(value):
+        # As an external tool would, without the forecast_runs table.
+        external.execute('DROP TABLE IF EXISTS forecast')
+        pd.DataFrame({
+            'timestamp': [(now + pd.Timedelta(hours=h)).strftime('%Y-%m-%d %H:%M:%S')
+                          for h in range(3)],
+            'outtemp': [value] * 3,
+        }).to_sql('forecast', external, index=False)
+        external.commit()
+
+    def read_in_thread():
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            handler.get_parameter_data_for_time_period(
+                'outtemp', time_period='day')['outtemp'].tolist()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    write(1.0)
+    assert read_in_thread() == [1.0] * 3
+    write(2.0)
+    assert read_in_thread() == [2.0] * 3
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.ingest."""
+import gzip
+import json
+import pytest
+
+from data_handler import ingest
+from data_handler.handler import DataBaseHandler
+
+
+RECORDS = [
+    {'timestamp': '2022-01-01 00:00:00', 'outtemp': 1.0, 'unknown': 3},
+    {'timestamp': '2022-01-01 00:01:00', 'outtemp': 2.0},
+    {'timestamp': 'not a time', 'outtemp': 3.0},
+    {'outtemp': 4.0},
+]
+
+
+def test_parse_array_ndjson_and_gzip():
+    array = json.dumps(RECORDS).encode()
+    ndjson = '\n'.join(json.dumps(r) for r in RECORDS).encode()
+    assert ingest.parse_records(array) == RECORDS
+    assert ingest.parse_records(ndjson) == RECORDS
+    assert ingest.parse_records(ingest.decode_body(gzip.compress(ndjson))) == RECORDS
+
+
+def test_get_frame_validates():
+    df, nr_rejected = ingest.get_frame(RECORDS, {'timestamp', 'outtemp'})
+    assert nr_rejected == 2
+    assert list(df.columns) == ['timestamp', 'outtemp', 'epoch']
+    assert df['outtemp'].tolist() == [1.0, 2.0]
+
+
+def test_post_many_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    assert handler.post_many(RECORDS) == {
+        'received': 4, 'inserted': 2, 'duplicates': 0, 'rejected': 2
+    }
+    assert handler.post_many(RECORDS[:2] + RECORDS[:1]) == {
+        'received': 3, 'inserted': 0, 'duplicates': 3, 'rejected': 0
+    }
+    handler.post(timestamp=['2022-01-01 00:01:00', '2022-01-01 00:02:00'],
+                 outtemp=[2.0, 5.0])
+    assert len(handler.get_time_log()) == 3
+
+
+def test_get_frame_unequal_lists():
+    records = [{'timestamp': ['2022-01-01 00:00:00'], 'outtemp': [1.0, 2.0]}]
+    with pytest.raises(ValueError):
+        ingest.get_frame(records, {'timestamp', 'outtemp'})
+
+
+def test_parse_rejects_scalar_bodies():
+    for body in (b'5', b'"abc"', b'null'):
+        with pytest.raises(ValueError):
+            ingest.parse_records(body)
+    with pytest.raises(ValueError):
+        ingest.get_frame('abc', {'timestamp'})
+
+
+def test_get_frame_rejects_non_numeric():
+    records = [
+        {'timestamp': '2022-01-01 00:00:00', 'outtemp': 'warm'},
+        {'timestamp': '2022-01-01 00:01:00', 'outtemp': '2.5'},
+        {'timestamp': '2022-01-01 00:02:00', 'outtemp': None},
+    ]
+    df, nr_rejected = ingest.get_frame(records, {'timestamp', 'outtemp'})
+    assert nr_rejected == 1
+    assert df['timestamp'].tolist() == ['2022-01-01 00:01:00', '2022-01-01 00:02:00']
+    assert df['outtemp'].iloc[0] == 2.5
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Tests of the live update of the weather figure."""
+import inspect
+import pandas as pd
+
+from data_handler.handler import DataBaseHandler, to_epoch
+
+
+def test_rows_since_cursor(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    handler.post(timestamp=['2022-01-01 00:00:00', '2022-01-01 00:01:00'],
+                 outtemp=[1.0, 2.0])
+    cursor = to_epoch(handler.get_last_timestamp())
+    assert handler.get_parameter_data_since('epoch', 'outtemp', since=cursor).empty
+    handler.post(timestamp=['2022-01-01 00:02:00'], outtemp=[3.0])
+    df = handler.get_parameter_data_since('epoch', 'outtemp', since=cursor)
+    assert df['outtemp'].tolist() == [3.0]
+    assert df['epoch'].tolist() == [cursor + 60]
+
+
+def test_live_figure_is_extended(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    monkeypatch.setenv('FORECASTDB', str(tmp_path.joinpath('forecast.db')))
+    import app
+    now = pd.Timestamp.now(tz='Europe/Stockholm').floor('min').tz_localize(None)
+    times = pd.date_range(end=now - pd.Timedelta(minutes=5), periods=10, freq='min')
+    app.db_handler.post(timestamp=list(times.strftime('%Y-%m-%d %H:%M:%S')),
+                        intemp=[20.0] * 10)
+    figure = app.build_figure('intemp', 'day')
+    assert app.get_live_points(figure) == 10
+    assert isinstance(app.encode_figure(figure)['data'][0]['x'], list)
+
+    cursor = dict(app.get_cursor(), points=10)
+    app.db_handler.post(timestamp=[now.strftime('%Y-%m-%d %H:%M:%S')], intemp=[None])
+    extend_figure = inspect.unwrap(app.extend_figure)
+    (update, traces, max_points), cursor = extend_figure(1, 'intemp', 'day', cursor)
+    assert update == {'x': [[to_epoch(now) * 1000]], 'y': [[None]]}
+    assert (traces, max_points) == ([0], 10)
+    assert cursor['epoch'] == to_epoch(now)
+
+    monkeypatch.setattr(app, 'POINT_BUDGET', 5)
+    assert app.get_live_points(app.build_figure('intemp', 'day')) is None
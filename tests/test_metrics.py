@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.metrics."""
+import json
+from flask import Response
+
+from data_handler import metrics
+from data_handler.pool import ConnectionPool
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram('test_seconds', 'Test.', (0.1, 1.))
+    for value in (0.05, 0.1, 0.5, 2.):
+        histogram.observe(value, 'stage')
+    text = '\n'.join(histogram.render())
+    assert 'test_seconds_bucket{stage="stage",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{stage="stage",le="1.0"} 3' in text
+    assert 'test_seconds_bucket{stage="stage",le="+Inf"} 4' in text
+    assert 'test_seconds_count{stage="stage"} 4' in text
+
+
+def test_timed_rows_and_slow_log(tmp_path, monkeypatch):
+    log_path = tmp_path.joinpath('slow.log')
+    monkeypatch.setenv('SLOWQUERYLOG', str(log_path))
+    monkeypatch.setenv('SLOWQUERYSECONDS', '0')
+    monkeypatch.setenv('TESTDB', str(tmp_path.joinpath('test.db')))
+    conn = ConnectionPool('TESTDB').connect()
+
+    @metrics.timed('test.query')
+    def query(value):
+        return conn.execute('select ? + 1', (value,)).fetchall()
+
+    assert query(41) == [(42,)]
+    assert 'weather_stage_rows_count{stage="test.query"} ' in metrics.render()
+    entry = json.loads(log_path.read_text().splitlines()[-1])
+    assert entry['stage'] == 'test.query'
+    assert entry['statements'] == ['select 41 + 1']
+
+
+def test_timed_route_covers_streamed_body():
+    sent = []
+
+    @metrics.timed_route('test.route')
+    def view():
+        return Response((sent.append(chunk) or chunk for chunk in 'abc')), 200
+
+    response, _ = view()
+    assert 'weather_stage_seconds_count{stage="test.route"}' not in metrics.render()
+    assert b''.join(response.iter_encoded()) == b'abc'
+    response.close()
+    text = metrics.render()
+    assert 'weather_stage_seconds_count{stage="test.route"} 1' in text
+    assert 'weather_stage_rows_count{stage="test.route"}' not in text
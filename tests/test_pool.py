@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.pool."""
+import gc
+import threading
+from data_handler.pool import ConnectionPool
+
+
+def test_connection_is_reused(tmp_path, monkeypatch):
+    monkeypatch.setenv('POOLTESTDB', str(tmp_path.joinpath('pool.db')))
+    pool = ConnectionPool('POOLTESTDB')
+    conn = pool.connect()
+    for _ in range(10):
+        assert pool.connect() is conn
+    assert pool.stats() == {'opens': 1, 'reuses': 10, 'open_connections': 1}
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    pool.close_all()
+
+
+def test_connection_per_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv('POOLTESTDB', str(tmp_path.joinpath('pool.db')))
+    pool = ConnectionPool('POOLTESTDB')
+    main_conn = pool.connect()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_conn
+    assert pool.stats()['opens'] == 2
+    pool.close_all()
+    assert pool.stats()['open_connections'] == 0
+
+
+def test_connection_closed_with_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv('POOLTESTDB', str(tmp_path.joinpath('pool.db')))
+    pool = ConnectionPool('POOLTESTDB')
+    pool.connect()
+    for _ in range(5):
+        thread = threading.Thread(target=pool.connect)
+        thread.start()
+        thread.join()
+    gc.collect()
+    assert pool.stats()['opens'] == 6
+    assert pool.stats()['open_connections'] == 1
+    pool.close_all()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.query."""
+import pytest
+
+from data_handler import query
+from data_handler.handler import DataBaseHandler
+
+
+def test_statement_text_depends_on_shape_only():
+    first = query.get_period_statement('weather', ('timestamp', 'outtemp'))
+    second = query.get_period_statement('weather', ('timestamp', 'outtemp'))
+    assert first == second
+    assert 'between ? and ?' in first
+
+
+def test_unknown_columns_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    handler.post(timestamp=[handler.today.strftime('%Y-%m-%d %H:%M:%S')],
+                 outtemp=[3.2])
+    with pytest.raises(ValueError):
+        handler.get_parameter_data_for_time_period(
+            'timestamp', 'outtemp from weather; drop table weather --'
+        )
+    with pytest.raises(ValueError):
+        handler.get_rain_totals('outtemp')
+    df = handler.get_parameter_data_for_time_period('timestamp', 'outtemp')
+    assert df['outtemp'].tolist() == [3.2]
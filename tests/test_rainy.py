@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.rainy."""
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from data_handler import rainy
+from data_handler.handler import DataBaseHandler, to_epoch
+from synthetic import get_weather_frame
+
+
+def test_increments_handle_resets_and_gaps():
+    increments = rainy.get_increments([0.2, 0.5, np.nan, 0.7, 0.1, 0.1])
+    assert increments.tolist() == [0.2, 0.3, 0., 0.2, 0.1, 0.]
+
+
+def test_rainframe_sums_over_counter_reset():
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2022-01-01 10:10', '2022-01-01 10:40',
+                                     '2022-01-01 10:50', '2022-01-01 11:10']),
+        # Counter reset at 10:50 (eg. station restart).
+        'raind': [1.0, 2.0, 0.5, 0.5],
+    })
+    out = rainy.get_rainframe(df, 'raind')
+    assert out['raind'].tolist() == [2.5]
+    assert out['timestamp'].tolist() == [pd.Timestamp('2022-01-01')]
+
+
+def test_incremental_totals_match_backfill(tmp_path, monkeypatch):
+    path = str(tmp_path.joinpath('weather.db'))
+    monkeypatch.setenv('TSTWEATHERDB', path)
+    df = get_weather_frame(20, freq_seconds=600, end='2022-02-03 12:00')
+    handler = DataBaseHandler()
+    for rows in np.array_split(np.arange(len(df)), 7):
+        handler.post(**df.iloc[rows].to_dict('list'))
+    # A late upload of an old record.
+    handler.post(**df.iloc[[5]].assign(timestamp='2022-01-14 15:35:00').to_dict('list'))
+
+    conn = sqlite3.connect(path)
+    incremental = pd.read_sql('select * from rain_totals order by 1, 2', conn)
+    rainy.backfill(conn)
+    conn.commit()
+    rebuilt = pd.read_sql('select * from rain_totals order by 1, 2', conn)
+    pd.testing.assert_frame_equal(incremental, rebuilt)
+
+    daily = rainy.read(conn, 'raind', to_epoch('2022-01-20'), to_epoch('2022-01-25'))
+    assert len(daily) == 6
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.responses."""
+import gzip
+from flask import Flask, Response, request
+
+from data_handler import responses
+
+
+def test_compress_threshold_and_encoding():
+    big = Response('x' * 5000, mimetype='application/json')
+    responses.compress(big, 'gzip, deflate')
+    assert big.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(big.get_data()) == b'x' * 5000
+
+    small = Response('x' * 10, mimetype='application/json')
+    responses.compress(small, 'gzip')
+    assert 'Content-Encoding' not in small.headers
+
+    refused = Response('x' * 5000, mimetype='application/json')
+    responses.compress(refused, 'gzip;q=0, identity')
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_streamed_gzip():
+    streamed = Response(iter(['{"a": ', '[1, 2]}']), mimetype='application/json')
+    responses.compress(streamed, 'gzip')
+    assert gzip.decompress(b''.join(streamed.response)) == b'{"a": [1, 2]}'
+
+
+def test_etag_matches():
+    etag = responses.get_etag('version', 'args')
+    assert etag == responses.get_etag('version', 'args')
+    assert etag != responses.get_etag('other', 'args')
+    app = Flask(__name__)
+    with app.test_request_context(headers={'If-None-Match': f'"x", {etag}'}):
+        assert responses.matches(request, etag)
+    with app.test_request_context():
+        assert not responses.matches(request, etag)
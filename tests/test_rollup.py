@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.rollup."""
+import sqlite3
+import pandas as pd
+
+from data_handler import rollup
+from data_handler.handler import DataBaseHandler, to_epoch
+
+
+def get_rows(handler, start, periods):
+    time = pd.date_range(start, periods=periods, freq='10min')
+    return dict(
+        timestamp=list(time.strftime('%Y-%m-%d %H:%M:%S')),
+        outtemp=[float(i % 7) for i in range(periods)],
+        gust=[float(i % 5) for i in range(periods)],
+    )
+
+
+def test_incremental_update_matches_backfill(tmp_path, monkeypatch):
+    path = str(tmp_path.joinpath('weather.db'))
+    monkeypatch.setenv('TSTWEATHERDB', path)
+    handler = DataBaseHandler()
+    handler.post(**get_rows(handler, '2022-01-01 00:00', 50))
+    handler.post(**get_rows(handler, '2022-01-01 08:20', 100))
+
+    conn = sqlite3.connect(path)
+    incremental = pd.read_sql('select * from weather_hourly', conn)
+    rollup.backfill(conn)
+    rebuilt = pd.read_sql('select * from weather_hourly', conn)
+    pd.testing.assert_frame_equal(incremental, rebuilt, check_dtype=False)
+
+    df = rollup.read(conn, ('timestamp', 'outtemp', 'gust'),
+                     to_epoch('2022-01-01'), to_epoch('2022-01-02'), 'hourly')
+    assert df['timestamp'].iloc[0] == pd.Timestamp('2022-01-01')
+    assert df['outtemp'].iloc[0] == 2.5
+    assert df['gust'].iloc[0] == 4.
+
+
+def test_get_resolution():
+    assert rollup.get_resolution(('timestamp', 'outtemp'), 1) == 'raw'
+    assert rollup.get_resolution(('timestamp', 'outtemp'), 7) == 'raw'
+    assert rollup.get_resolution(('timestamp', 'outtemp'), 30) == 'hourly'
+    assert rollup.get_resolution(('timestamp', 'outtemp'), 365) == 'hourly'
+    assert rollup.get_resolution(('timestamp', 'outtemp'), 3650) == 'daily'
+    assert rollup.get_resolution(('winsp', 'windir'), 365) == 'raw'
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.sampling."""
+import numpy as np
+import pandas as pd
+
+from data_handler import sampling
+
+
+def get_frame(n=100000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=n, freq='min'),
+        'value': rng.normal(0, 1, n).cumsum(),
+    })
+
+
+def test_lttb_keeps_budget_and_end_points():
+    df = get_frame()
+    out = sampling.downsample(df, 'value', method='lttb', threshold=500)
+    assert len(out) == 500
+    assert out['timestamp'].iloc[0] == df['timestamp'].iloc[0]
+    assert out['timestamp'].iloc[-1] == df['timestamp'].iloc[-1]
+    assert out['timestamp'].is_monotonic_increasing
+
+
+def test_minmax_keeps_peaks():
+    df = get_frame()
+    out = sampling.downsample(df, 'value', method='minmax', threshold=500)
+    assert len(out) <= 500
+    assert out['value'].max() == df['value'].max()
+    assert out['value'].min() == df['value'].min()
+
+
+def test_sum_keeps_total():
+    df = get_frame()
+    out = sampling.downsample(df, 'value', method='sum', threshold=500)
+    assert len(out) == 500
+    assert np.isclose(out['value'].sum(), df['value'].sum())
+
+
+def test_short_series_untouched():
+    df = get_frame(100)
+    assert sampling.downsample(df, 'value', threshold=500) is df
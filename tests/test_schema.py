@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.schema and the weather table queries."""
+import sqlite3
+import pandas as pd
+import pytest
+
+from data_handler import windcube
+from data_handler.handler import DataBaseHandler, to_epoch
+from data_handler.schema import migrate, is_migrated, get_columns
+
+
+def test_migrate_backfills_epoch(tmp_path):
+    conn = sqlite3.connect(tmp_path.joinpath('weather.db'))
+    assert not migrate(conn)
+    pd.DataFrame({
+        'timestamp': ['2021-11-29 22:12:40', '2021-11-30 00:00:00'],
+        'outtemp': [1.5, 2.5],
+    }).to_sql('weather', conn, index=False)
+    assert not is_migrated(conn)
+    assert migrate(conn)
+    assert is_migrated(conn)
+    assert 'epoch' in get_columns(conn, 'weather')
+    epochs = [r[0] for r in conn.execute('select epoch from weather')]
+    assert epochs == [to_epoch('2021-11-29 22:12:40'), to_epoch('2021-11-30')]
+    plan = conn.execute(
+        'explain query plan select * from weather where epoch between 0 and 1'
+    ).fetchall()
+    assert 'ix_weather_epoch' in str(plan)
+
+
+def test_post_then_query(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    now = handler.today.strftime('%Y-%m-%d %H:%M:%S')
+    handler.post(timestamp=[now], outtemp=[3.2])
+    df = handler.get_parameter_data_for_time_period('timestamp', 'outtemp')
+    assert df['outtemp'].tolist() == [3.2]
+    assert handler.get_recent_time_log() == [now]
+
+
+def test_period_data_is_datetime(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    handler.post(timestamp=[handler.today.strftime('%Y-%m-%d %H:%M:%S')],
+                 outtemp=[3.2])
+    df = handler.get_parameter_data_for_time_period('timestamp', 'outtemp')
+    assert pd.api.types.is_datetime64_dtype(df['timestamp'])
+
+
+def test_latest_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    assert handler.get_latest_snapshot() == {}
+    handler.post(timestamp=['2022-01-01 00:01:00', '2022-01-01 00:00:00'],
+                 outtemp=[2.0, 1.0], winsp=[None, 3.0])
+    assert handler.get_last_timestamp() == '2022-01-01 00:01:00'
+    assert handler.get_last_parameter_value('outtemp') == 2.0
+    assert handler.get_last_parameter_value('winsp') is None
+
+    other_worker = DataBaseHandler()
+    assert other_worker.get_last_parameter_value('outtemp') == 2.0
+    handler.post(timestamp=['2022-01-01 00:02:00'], outtemp=[4.0])
+    assert other_worker.get_last_parameter_value('outtemp') == 4.0
+
+
+def test_request_path_does_not_migrate(tmp_path, monkeypatch):
+    db_path = tmp_path.joinpath('weather.db')
+    monkeypatch.setenv('TSTWEATHERDB', str(db_path))
+    conn = sqlite3.connect(db_path)
+    pd.DataFrame({
+        'timestamp': ['2021-11-29 22:12:40'], 'outtemp': [1.5],
+    }).to_sql('weather', conn, index=False)
+    conn.close()
+    handler = DataBaseHandler()
+    assert 'epoch' not in get_columns(handler.get_conn(), 'weather')
+    assert handler.migrate()
+    assert handler.get_conn().execute(
+        'select count(*) from weather_hourly'
+    ).fetchone()[0] == 1
+
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path.joinpath('weather.db'))
+    pd.DataFrame({
+        'timestamp': ['2021-11-29 22:12:40'], 'outtemp': [1.5], 'winsp': [2.0],
+        'windir': [180.0],
+    }).to_sql('weather', conn, index=False)
+
+    def fail(conn):
+        raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(windcube, 'backfill', fail)
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    assert not is_migrated(conn)
+    monkeypatch.undo()
+    assert migrate(conn)
+    assert is_migrated(conn)
+    for table in ('weather_hourly', 'wind_histogram'):
+        assert conn.execute(f'select count(*) from {table}').fetchone()[0] == 1
+
+
+def test_time_log_bounds_parsed_at_once(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    with pytest.raises(ValueError):
+        handler.iter_time_log(since='garbage')
+    handler.post(timestamp=['2022-01-01 00:00:00', '2022-01-02 00:00:00'],
+                 outtemp=[1.0, 2.0])
+    chunks = handler.iter_time_log(since='2022-01-01 12:00')
+    assert [row[0] for rows in chunks for row in rows] == ['2022-01-02 00:00:00']
+
+
+def test_time_log_of_new_database(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    assert list(DataBaseHandler().iter_time_log()) == []
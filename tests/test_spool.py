@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.spool."""
+import json
+import time
+import pytest
+
+from data_handler.handler import DataBaseHandler
+from data_handler.spool import IngestQueue
+
+
+def test_drain_writes_batches(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    monkeypatch.setenv('INGESTQUEUE', str(tmp_path.joinpath('spool.db')))
+    handler = DataBaseHandler()
+    queue = IngestQueue(batch_size=2)
+    queue.put([{'timestamp': '2022-01-01 00:00:00', 'outtemp': 1.0}], handler.db_fields)
+    queue.put([{'timestamp': '2022-01-01 00:01:00', 'outtemp': 2.0}], handler.db_fields)
+    queue.put([{'timestamp': '2022-01-01 00:01:00', 'outtemp': 2.0},
+               {'timestamp': '2022-01-01 00:02:00', 'outtemp': 3.0}], handler.db_fields)
+    assert queue.stats()['depth'] == 3
+    assert queue.stats()['queued_records'] == 4
+    assert queue.drain(handler) == 2
+    assert queue.drain(handler) == 1
+    assert queue.drain(handler) == 0
+    stats = queue.stats()
+    assert stats['depth'] == 0
+    assert stats['recent_batches'] == 2
+    assert handler.get_last_parameter_value('outtemp') == 3.0
+
+
+def test_single_writer(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    monkeypatch.setenv('INGESTQUEUE', str(tmp_path.joinpath('spool.db')))
+    first, second = IngestQueue(), IngestQueue()
+    assert first.acquire_writer_lock()
+    assert not second.acquire_writer_lock()
+    first.release_writer_lock()
+    assert second.acquire_writer_lock()
+    second.release_writer_lock()
+
+
+def test_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    monkeypatch.setenv('INGESTQUEUE', str(tmp_path.joinpath('spool.db')))
+    handler = DataBaseHandler()
+    queue = IngestQueue(poll_interval=0.05)
+    queue.start(handler)
+    queue.put([{'timestamp': '2022-01-01 00:00:00', 'outtemp': 1.0}], handler.db_fields)
+    for _ in range(100):
+        if queue.stats()['depth'] == 0:
+            break
+        time.sleep(0.05)
+    queue.stop()
+    assert queue.stats()['depth'] == 0
+    assert handler.get_last_timestamp() == '2022-01-01 00:00:00'
+
+
+def test_bad_item_is_set_aside(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    monkeypatch.setenv('INGESTQUEUE', str(tmp_path.joinpath('spool.db')))
+    handler = DataBaseHandler()
+    queue = IngestQueue()
+    bad = [{'timestamp': ['2022-01-01 00:00:00'], 'outtemp': [1.0, 2.0]}]
+    with pytest.raises(ValueError):
+        queue.put(bad, handler.db_fields)
+    with pytest.raises(ValueError):
+        queue.put([{'timestamp': 'not a time', 'outtemp': 1.0}], handler.db_fields)
+    assert queue.stats()['depth'] == 0
+
+    # Spooled before the check existed.
+    conn = queue.pool.connect()
+    conn.execute(
+        'INSERT INTO spool (received, nr_records, body) VALUES (?, 1, ?)',
+        (time.time(), json.dumps(bad))
+    )
+    conn.commit()
+    queue.put([{'timestamp': '2022-01-01 00:01:00', 'outtemp': 2.0}], handler.db_fields)
+    assert queue.drain(handler) == 2
+    stats = queue.stats()
+    assert stats['depth'] == 0
+    assert stats['dead_items'] == 1
+    assert handler.get_last_parameter_value('outtemp') == 2.0
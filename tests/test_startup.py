@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Import-time profile of the app (python -X importtime)."""
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Generous, the point is to catch large regressions.
+BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', 10))
+
+DEFERRED = ('plotly.express',)
+
+
+def test_app_import_profile(tmp_path):
+    env = dict(
+        os.environ,
+        TSTWEATHERDB=str(tmp_path.joinpath('weather.db')),
+        FORECASTDB=str(tmp_path.joinpath('forecast.db')),
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f'import sys, app; print([m for m in {DEFERRED!r} if m in sys.modules])'],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == '[]'
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                profile[name.strip()] = int(cumulative) / 1e6
+    slowest = sorted(profile.items(), key=lambda item: -item[1])[:10]
+    assert profile['app'] < BUDGET_SECONDS, '\n'.join(
+        f'{seconds:8.3f} s  {name}' for name, seconds in slowest
+    )
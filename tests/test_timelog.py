@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.timelog."""
+import json
+import pytest
+
+from data_handler import timelog
+
+
+CHUNKS = [
+    [('2022-01-01 00:00:00', 0)],
+    [('2022-01-01 00:01:00', 60), ('2022-01-01 00:05:00', 300)],
+    [('2022-01-01 00:06:00', 360)],
+]
+
+
+def decode(pieces):
+    return json.loads(''.join(pieces))
+
+
+def test_stream_list():
+    assert decode(timelog.stream_list(CHUNKS)) == {
+        'time_log': [row[0] for rows in CHUNKS for row in rows]
+    }
+
+
+def test_stream_deltas():
+    assert decode(timelog.stream_deltas(CHUNKS)) == {
+        'start': '2022-01-01 00:00:00', 'deltas': [60, 240, 60]
+    }
+
+
+def test_stream_gaps():
+    assert decode(timelog.stream_gaps(CHUNKS, 60)) == {
+        'interval': 60, 'gaps': [['2022-01-01 00:01:00', '2022-01-01 00:05:00']]
+    }
+
+
+@pytest.mark.parametrize('stream', [timelog.stream_list, timelog.stream_deltas])
+def test_empty(stream):
+    assert decode(stream([]))
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.typed."""
+import numpy as np
+import pandas as pd
+
+from data_handler import typed
+
+
+def test_encode_traces_round_trip():
+    time = pd.Series(pd.to_datetime(['2022-01-01 00:00:00', '2022-01-01 00:10:00']))
+    trace, = typed.encode_traces([dict(x=time, y=[1.5, np.nan], name='Observationer')])
+    assert trace['name'] == 'Observationer'
+    assert trace['x']['dtype'] == 'f8'
+    assert typed.decode(trace['x']).tolist() == [1640995200000., 1640995800000.]
+    y = typed.decode(trace['y'])
+    assert y.dtype == np.float32
+    assert y[0] == 1.5 and np.isnan(y[1])
+
+
+def test_encode_figure_keeps_layout():
+    figure = dict(
+        data=[dict(x=pd.to_datetime(['2022-01-01']), y=[1.0])],
+        layout=dict(title='T', xaxis=dict(gridcolor='#768DB7')),
+    )
+    encoded = typed.encode_figure(figure)
+    assert encoded['layout']['xaxis'] == dict(gridcolor='#768DB7', type='date')
+    assert 'type' not in figure['layout']['xaxis']
+    assert typed.decode(encoded['data'][0]['y']).tolist() == [1.0]
+
+
+def test_plain_trace_for_extend():
+    figure = dict(
+        data=[dict(x=pd.to_datetime(['2022-01-01']), y=[np.nan]),
+              dict(x=pd.to_datetime(['2022-01-01']), y=[2.0])],
+        layout=dict(),
+    )
+    observations, forecast = typed.encode_figure(figure, plain=(0,))['data']
+    assert observations == dict(x=[1640995200000], y=[None])
+    assert forecast['y']['dtype'] == 'f4'
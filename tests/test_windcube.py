@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.windcube."""
+import numpy as np
+import pandas as pd
+
+from data_handler import windy
+from data_handler.handler import DataBaseHandler
+from synthetic import get_weather_frame, make_weather_db
+
+
+def test_rose_from_histograms_matches_raw(tmp_path, monkeypatch):
+    db_path = tmp_path.joinpath('weather.db')
+    monkeypatch.setenv('TSTWEATHERDB', str(db_path))
+    # Keep observations off the (moving) start of the period.
+    end = pd.Timestamp.now(tz='Europe/Stockholm') - pd.Timedelta(seconds=150)
+    make_weather_db(db_path, days=9, freq_seconds=300, end=end)
+    handler = DataBaseHandler()
+    handler.migrate()
+    for period in ('day', 'week'):
+        df = handler.get_parameter_data_for_time_period(
+            'winsp', 'windir', time_period=period, resolution='raw'
+        )
+        boolean = df['winsp'].notna() & df['windir'].notna() & (df['winsp'] > 0.)
+        expected = windy.get_wind_rose(df.loc[boolean, 'winsp'], df.loc[boolean, 'windir'])
+        rose = handler.get_wind_rose('winsp', time_period=period)
+        pd.testing.assert_frame_equal(rose, expected)
+
+
+def test_histograms_follow_inserts(tmp_path, monkeypatch):
+    monkeypatch.setenv('TSTWEATHERDB', str(tmp_path.joinpath('weather.db')))
+    handler = DataBaseHandler()
+    df = get_weather_frame(3, freq_seconds=600)
+    handler.post_many(df.iloc[::2].to_dict('records'))
+    handler.post_many(df.iloc[1::2].to_dict('records'))
+    conn = handler.get_conn()
+    stored = conn.execute(
+        "select sum(count) from wind_histogram where parameter = 'gust'"
+    ).fetchone()[0]
+    assert stored == int(((df['gust'] > 0) & df['windir'].notna()).sum())
+    assert np.isclose(handler.get_wind_rose('gust', 'week')['frequency'].sum(), 100)
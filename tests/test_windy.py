@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Tests of data_handler.windy."""
+import pathlib
+import numpy as np
+import pandas as pd
+
+from data_handler import windy
+
+
+PATH = pathlib.Path(__file__).parent.parent
+DATA_PATH = PATH.joinpath("data").resolve()
+
+
+def get_reference_windframe(df):
+    """Row by row implementation, as used before vectorisation."""
+    combos = df[['direction', 'strength']].apply(tuple, axis=1)
+    data = {c: [] for c in ('direction', 'strength', 'frequency')}
+    nr_obs = float(len(combos))
+    for strength in sorted(df['strength'].unique()):
+        for windir in windy.wind_directions:
+            data['direction'].append(windir)
+            data['strength'].append(strength)
+            data['frequency'].append(((combos == (windir, strength)).sum() / nr_obs * 100))
+    return pd.DataFrame(data)
+
+
+def get_wind_data():
+    df = pd.read_feather(DATA_PATH.joinpath('testdata'))
+    boolean = ~pd.isnull(df['winsp']) & ~pd.isnull(df['windir']) & (df['winsp'] > 0.)
+    return df.loc[boolean, ['winsp', 'windir']].reset_index(drop=True)
+
+
+def test_direction_codes_match_get_direction():
+    values = np.array([-5., 0., 11.25, 11.2499, 33.75, 348.7, 348.75, 359.9,
+                       360., 400., np.nan])
+    expected = [windy.get_direction(x) for x in values]
+    codes = windy.get_direction_codes(values)
+    result = [windy.wind_directions[c] if c >= 0 else np.nan for c in codes]
+    assert result[:-1] == expected[:-1]
+    assert pd.isnull(result[-1]) and pd.isnull(expected[-1])
+
+
+def test_wind_rose_matches_reference():
+    df = get_wind_data()
+    df['direction'] = df['windir'].apply(windy.get_direction)
+    df['strength'] = df['winsp'].apply(windy.get_speed_range)
+    expected = get_reference_windframe(df)
+    pd.testing.assert_frame_equal(
+        windy.get_wind_rose(df['winsp'], df['windir']), expected, check_dtype=False
+    )
+    pd.testing.assert_frame_equal(
+        windy.get_windframe(df), expected, check_dtype=False
+    )
+
+
+def test_empty_wind_rose():
+    assert windy.get_wind_rose(pd.Series([], dtype=float), pd.Series([], dtype=float)).empty